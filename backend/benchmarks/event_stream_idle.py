@@ -0,0 +1,149 @@
+"""Many idle event streams: server memory, idle CPU and push latency.
+
+Starts the API under uvicorn in a subprocess, opens one server-sent event
+stream per user (10k by default) and waits for each stream's initial cart
+snapshot. It then leaves them idle and measures the server's CPU time.
+Finally it changes the carts of a sample of users and measures how long
+each change takes to arrive on that user's stream.
+
+Run from the backend directory:
+
+    python benchmarks/event_stream_idle.py [--connections 10000] [--idle 10]
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVER = """
+import sys
+sys.path.insert(0, {backend!r})
+import config
+config.RATE_LIMIT_ENABLED = False
+config.MAX_EVENT_SUBSCRIBERS = {connections} + 100
+import main, uvicorn
+uvicorn.run(main.app, host="127.0.0.1", port={port}, log_level="warning", backlog=4096)
+"""
+
+
+def raise_fd_limit(needed: int):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+
+def process_stats(pid: int) -> tuple:
+    """(resident MB, user + system CPU seconds) of a process, from /proc"""
+    with open(f"/proc/{pid}/status") as f:
+        rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:")) / 1024
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    return rss, cpu
+
+
+async def open_stream(port: int, user_id: str, received: dict, ready: asyncio.Event):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET /api/events/{user_id} HTTP/1.1\r\nHost: localhost\r\nAccept: text/event-stream\r\n\r\n".encode())
+    await writer.drain()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            if line.startswith(b"event: cart.snapshot"):
+                ready.set()
+            elif line.startswith(b"event: cart.updated"):
+                received[user_id] = time.perf_counter()
+    finally:
+        writer.close()
+
+
+async def change_cart(port: int, user_id: str) -> float:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    query = "product_id=p1&product_name=Phone&price=%E2%82%B9999&quantity=1&image_url=x"
+    started = time.perf_counter()
+    writer.write(
+        f"POST /api/cart/{user_id}/add?{query} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Length: 0\r\nConnection: close\r\n\r\n".encode()
+    )
+    await writer.drain()
+    await reader.read()
+    writer.close()
+    return started
+
+
+async def run(args, pid: int):
+    received = {}
+    streams = []
+    rss_before, _ = process_stats(pid)
+
+    started = time.perf_counter()
+    for batch_start in range(0, args.connections, args.batch):
+        events = []
+        for i in range(batch_start, min(batch_start + args.batch, args.connections)):
+            ready = asyncio.Event()
+            events.append(ready)
+            streams.append(asyncio.ensure_future(open_stream(args.port, f"user{i}", received, ready)))
+        await asyncio.wait_for(asyncio.gather(*(event.wait() for event in events)), 60)
+    connect_s = time.perf_counter() - started
+    rss_connected, cpu_before_idle = process_stats(pid)
+    print(f"connected {args.connections} streams in {connect_s:.1f}s")
+    print(
+        f"server RSS: {rss_before:.0f} MB idle, {rss_connected:.0f} MB with streams"
+        f" ({(rss_connected - rss_before) * 1024 / args.connections:.1f} KB per stream)"
+    )
+
+    await asyncio.sleep(args.idle)
+    _, cpu_after_idle = process_stats(pid)
+    print(f"server CPU while idle: {(cpu_after_idle - cpu_before_idle) / args.idle * 100:.1f}% of one core")
+
+    sample = random.Random(1).sample(range(args.connections), min(args.pushes, args.connections))
+    sent = {}
+    for i in sample:
+        sent[f"user{i}"] = await change_cart(args.port, f"user{i}")
+    await asyncio.sleep(1)
+    latencies = sorted((received[user] - sent[user]) * 1000 for user in sent if user in received)
+    if latencies:
+        print(
+            f"push latency over {len(latencies)}/{len(sent)} changes: p50 {latencies[len(latencies) // 2]:.2f} ms,"
+            f" p99 {latencies[int(len(latencies) * 0.99)]:.2f} ms"
+        )
+    else:
+        print("no pushes received")
+
+    for stream in streams:
+        stream.cancel()
+    await asyncio.gather(*streams, return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=10000)
+    parser.add_argument("--idle", type=float, default=10, help="seconds to leave the streams idle")
+    parser.add_argument("--pushes", type=int, default=200, help="cart changes to time")
+    parser.add_argument("--batch", type=int, default=500, help="streams opened concurrently")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    raise_fd_limit(args.connections + 256)
+    server = subprocess.Popen(
+        [sys.executable, "-c", SERVER.format(backend=BACKEND, connections=args.connections, port=args.port)],
+        preexec_fn=lambda: raise_fd_limit(args.connections + 256)
+    )
+    try:
+        time.sleep(3)
+        asyncio.run(run(args, server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Flash-sale contention on one hot SKU: throughput and an oversell check.
+
+Many threads race to reserve one unit each of a single SKU. Each winner
+commits or releases its reservation (like a payment succeeding or
+failing), and some reservations are abandoned and left to expire. At the
+end every unit must be accounted for exactly once.
+
+Run from the backend directory:
+
+    python benchmarks/inventory_contention.py [--threads 16] [--stock 50000]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.inventory_service import InventoryService
+
+SKU = "hot-sku"
+
+
+def worker(attempts: int, results: dict, lock: threading.Lock, barrier: threading.Barrier):
+    rng = random.Random()
+    reserved = committed = rejected = abandoned = 0
+    barrier.wait()
+    for _ in range(attempts):
+        try:
+            reservation_id = InventoryService.reserve({SKU: 1}, ttl=0.05)
+        except ValueError:
+            rejected += 1
+            continue
+        reserved += 1
+        roll = rng.random()
+        if roll < 0.75:
+            if InventoryService.commit(reservation_id):
+                committed += 1
+        elif roll < 0.95:
+            InventoryService.release(reservation_id)
+        else:
+            abandoned += 1
+
+    with lock:
+        for key, value in (("reserved", reserved), ("committed", committed),
+                           ("rejected", rejected), ("abandoned", abandoned)):
+            results[key] += value
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--stock", type=int, default=50000)
+    parser.add_argument("--attempts", type=int, default=10000, help="reserve attempts per thread")
+    args = parser.parse_args()
+
+    InventoryService.set_stock(SKU, args.stock)
+    results = {"reserved": 0, "committed": 0, "rejected": 0, "abandoned": 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(args.threads + 1)
+    threads = [
+        threading.Thread(target=worker, args=(args.attempts, results, lock, barrier))
+        for _ in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    # Let abandoned reservations hit their TTL
+    time.sleep(0.1)
+    InventoryService.release_expired(now=time.monotonic())
+
+    stock = InventoryService.get_stock(SKU)
+    attempts = args.threads * args.attempts
+    print(f"{attempts} reserve attempts on one SKU from {args.threads} threads in {elapsed:.2f}s")
+    print(f"  {attempts / elapsed:,.0f} reserve attempts/s, {results['reserved'] / elapsed:,.0f} reservations/s")
+    print(f"  reserved={results['reserved']} committed={results['committed']} "
+          f"rejected={results['rejected']} abandoned={results['abandoned']}")
+    print(f"  final available={stock['available']} sold={stock['sold']}")
+
+    assert stock["sold"] == results["committed"], "sold count does not match commits"
+    assert stock["sold"] <= args.stock, "oversold"
+    assert stock["available"] + stock["sold"] == args.stock, "stock leaked or duplicated"
+    assert not InventoryService.reservations, "reservations left outstanding"
+    print("OK: no overselling, every unit accounted for")
+
+
+if __name__ == "__main__":
+    main()
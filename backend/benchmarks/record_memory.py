@@ -0,0 +1,128 @@
+"""Bytes per cart line and per order: legacy dicts vs compact records.
+
+Run from the backend directory:
+
+    python benchmarks/record_memory.py [--carts 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import tracemalloc
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.cart_service import CartService
+from services.payment_service import PaymentService
+from services.records import OrderRecord, now_epoch
+
+CATALOG = [
+    (str(i), f"Product {i} (Black, 256GB)", f"₹{random.randint(300, 90000):,}",
+     f"https://images.unsplash.com/photo-{1500000000000 + i}-abcdef123456?w=300")
+    for i in range(500)
+]
+LINES_PER_CART = 3
+
+
+def legacy_carts(count: int) -> dict:
+    """Carts built the way CartService stored them before compact records"""
+    carts = {}
+    for n in range(count):
+        user_id = f"user{n}"
+        cart = {
+            "user_id": user_id,
+            "items": [],
+            "total_price": 0.0,
+            "created_at": datetime.now().isoformat(),
+            "updated_at": datetime.now().isoformat()
+        }
+        for product_id, name, price, image_url in random.sample(CATALOG, LINES_PER_CART):
+            # Values arrive from request parsing as fresh strings
+            cart["items"].append({
+                "product_id": "".join(product_id),
+                "product_name": "".join(name),
+                "price": "".join(price),
+                "quantity": 1,
+                "image_url": "".join(image_url)
+            })
+        cart["updated_at"] = datetime.now().isoformat()
+        carts[user_id] = cart
+    return carts
+
+
+def legacy_orders(carts: dict) -> dict:
+    orders = {}
+    for cart in carts.values():
+        order_id = str(uuid.uuid4())[:12]
+        orders[order_id] = {
+            "id": order_id,
+            "user_id": cart["user_id"],
+            "user_email": f"{cart['user_id']}@example.com",
+            "items": [dict(item) for item in cart["items"]],
+            "total_price": 1000.0,
+            "payment_status": "pending",
+            "order_status": "pending",
+            "delivery_address": "221B Baker Street, Mumbai",
+            "created_at": datetime.now().isoformat(),
+            "updated_at": datetime.now().isoformat()
+        }
+    return orders
+
+
+def compact_carts(count: int):
+    for n in range(count):
+        user_id = f"user{n}"
+        for product_id, name, price, image_url in random.sample(CATALOG, LINES_PER_CART):
+            CartService.add_to_cart(user_id, "".join(product_id), "".join(name), "".join(price), 1, "".join(image_url))
+
+
+def compact_orders():
+    """Orders stored the way PaymentService.create_order stores them.
+
+    Built directly rather than through create_order: the legacy side holds
+    no stock reservations, and reserving 3 lines per cart would exhaust
+    DEFAULT_STOCK at the default size.
+    """
+    for user_id in list(CartService.carts_db):
+        cart = CartService.get_cart(user_id)
+        order_id = str(uuid.uuid4())[:12]
+        PaymentService.orders_db[order_id] = OrderRecord(
+            order_id, user_id, f"{user_id}@example.com", cart["items"], 1000.0, "221B Baker Street, Mumbai", now_epoch()
+        )
+
+
+def measure(build) -> tuple:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return size, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--carts", type=int, default=20000)
+    args = parser.parse_args()
+
+    lines = args.carts * LINES_PER_CART
+
+    legacy_cart_bytes, carts = measure(lambda: legacy_carts(args.carts))
+    legacy_order_bytes, _ = measure(lambda: legacy_orders(carts))
+    compact_cart_bytes, _ = measure(lambda: compact_carts(args.carts))
+    compact_order_bytes, _ = measure(compact_orders)
+
+    print(f"{args.carts} carts, {lines} cart lines, {args.carts} orders")
+    print(f"{'':12}{'legacy':>12}{'compact':>12}{'saved':>8}")
+    for label, legacy, compact, per in (
+        ("cart line", legacy_cart_bytes, compact_cart_bytes, lines),
+        ("order", legacy_order_bytes, compact_order_bytes, args.carts),
+    ):
+        print(f"{label:12}{legacy / per:>10.0f} B{compact / per:>10.0f} B{1 - compact / legacy:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
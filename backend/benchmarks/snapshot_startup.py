@@ -0,0 +1,153 @@
+"""Cold start from a catalog snapshot: load time and memory at 1M products.
+
+Writes a synthetic catalog to a snapshot file, then in a fresh process
+measures how long mapping it takes, memory before and after, and the
+latency of the first searches and 1000 random id lookups. With --json the
+same catalog is also loaded from a JSON file for comparison.
+
+Run from the backend directory:
+
+    python benchmarks/snapshot_startup.py [--products 1000000] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BRANDS = ["Apple", "Samsung", "OnePlus", "Redmi", "Sony", "Lenovo", "HP", "boAt", "Puma", "Nike"]
+KINDS = ["Phone", "Laptop", "Headphones", "Watch", "Shirt", "Shoes", "Tablet", "Speaker", "Camera", "Backpack"]
+COLORS = ["Black", "Blue", "White", "Green", "Red", "Grey"]
+CATEGORIES = ["electronics", "clothing", "books", "home", "sports", "beauty", "toys", "groceries"]
+
+
+def synthetic_products(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    for i in range(count):
+        brand = rng.choice(BRANDS)
+        kind = rng.choice(KINDS)
+        yield {
+            "id": str(1000000000 + i),
+            "name": f"{brand} {kind} {rng.randint(1, 99)} ({rng.choice(COLORS)}, {rng.choice([64, 128, 256])}GB)",
+            "price": f"₹{rng.randint(199, 99999):,}",
+            "image_url": f"https://rukminim2.flixcart.com/image/312/312/item-{i}.jpeg",
+            "rating": f"{rng.uniform(3, 5):.1f}",
+            "reviews": f"{rng.randint(0, 50000)}",
+            "description": f"High-quality {brand} {kind}. Check our amazing deals!",
+            "category": rng.choice(CATEGORIES),
+            "url": f"/{brand.lower()}-{kind.lower()}/p/itm{i:010d}"
+        }
+
+
+def memory_mb() -> tuple:
+    """(resident, anonymous) memory in MB.
+
+    Resident includes mapped snapshot pages, which are shared page cache
+    the kernel can drop; anonymous is the process's own heap. Without
+    /proc both fall back to peak RSS.
+    """
+    try:
+        fields = {}
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if value.strip().endswith("kB"):
+                    fields[name] = int(value.split()[0]) / 1024
+        return fields["Rss"], fields["Anonymous"]
+    except (OSError, KeyError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+        return peak, peak
+
+
+def memory_delta(before: tuple) -> dict:
+    rss, anon = memory_mb()
+    return {"rss_mb": round(rss - before[0], 1), "anon_mb": round(anon - before[1], 1)}
+
+
+def measure(path: str, fmt: str):
+    """Runs in a fresh process so the page cache is the only warm state"""
+    from services.snapshot_service import CatalogSnapshot
+
+    before = memory_mb()
+    started = time.perf_counter()
+    if fmt == "json":
+        with open(path) as f:
+            products = json.load(f)
+    else:
+        snapshot = CatalogSnapshot(path)
+    load_ms = (time.perf_counter() - started) * 1000
+    result = {"format": fmt, "load_ms": round(load_ms, 2), "loaded": memory_delta(before)}
+    if fmt == "snapshot":
+        queries = ["samsung phone", "nike shoes black", "electronics", "apple watch 42"]
+        started = time.perf_counter()
+        for query in queries:
+            [snapshot.product(index) for index in snapshot.search(query, 20)]
+        result["search_ms"] = round((time.perf_counter() - started) * 1000 / len(queries), 3)
+
+        rng = random.Random(2)
+        ids = [str(1000000000 + rng.randrange(snapshot.count)) for _ in range(1000)]
+        started = time.perf_counter()
+        for product_id in ids:
+            snapshot.product(snapshot.find(product_id))
+        result["lookup_us"] = round((time.perf_counter() - started) * 1e6 / len(ids), 2)
+        result["queried"] = memory_delta(before)
+    else:
+        result["products"] = len(products)
+
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=1000000)
+    parser.add_argument("--json", action="store_true", help="also time loading the same catalog from JSON")
+    parser.add_argument("--measure", nargs=2, metavar=("PATH", "FORMAT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    from services.snapshot_service import write_snapshot
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "catalog.snapshot")
+        started = time.perf_counter()
+        count = write_snapshot(path, synthetic_products(args.products))
+        export_s = time.perf_counter() - started
+        print(f"export: {count} products in {export_s:.1f}s, {os.path.getsize(path) / 2 ** 20:.1f} MB")
+
+        runs = [(path, "snapshot")]
+        if args.json:
+            json_path = os.path.join(directory, "catalog.json")
+            with open(json_path, "w") as f:
+                json.dump(list(synthetic_products(args.products)), f)
+            print(f"json: {os.path.getsize(json_path) / 2 ** 20:.1f} MB")
+            runs.append((json_path, "json"))
+
+        for run_path, fmt in runs:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--measure", run_path, fmt],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output)
+            loaded = result["loaded"]
+            line = f"{fmt}: load {result['load_ms']} ms, +{loaded['rss_mb']} MB RSS (+{loaded['anon_mb']} MB heap)"
+            if fmt == "snapshot":
+                queried = result["queried"]
+                line += (
+                    f"; search {result['search_ms']} ms, id lookup {result['lookup_us']} us;"
+                    f" after queries +{queried['rss_mb']} MB RSS (+{queried['anon_mb']} MB heap)"
+                )
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -21,3 +21,102 @@ CORS_ORIGINS = ["*"]
 DEFAULT_SORT = "relevant"
 DEFAULT_LIMIT = 20
 MAX_LIMIT = 100
+
+# Product Detail Settings
+DETAIL_FETCH_CONCURRENCY = 8
+DETAIL_FETCH_TIMEOUT = 5
+DETAIL_CACHE_MAX_SIZE = 500
+MAX_BATCH_PRODUCTS = 50
+
+# Image Proxy Settings
+IMAGE_PROXY_ENABLED = True
+IMAGE_CACHE_DIR = ".image_cache"
+IMAGE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+IMAGE_WIDTHS = [100, 200, 300, 400, 600, 800]
+IMAGE_QUALITY = 80
+IMAGE_WORKERS = 2
+IMAGE_MAX_ORIGIN_BYTES = 10 * 1024 * 1024
+
+# Rate Limiting Settings
+RATE_LIMIT_ENABLED = True
+# Route class -> (tokens per second, burst size)
+RATE_LIMITS = {
+    "search_hit": (10.0, 30),
+    "search_miss": (0.5, 5),
+    "payment": (0.5, 5),
+    "default": (20.0, 60),
+}
+RATE_LIMIT_MAX_CLIENTS = 10000
+TRUST_FORWARDED_FOR = False
+
+# Load Shedding Settings
+MAX_INFLIGHT_REQUESTS = 256
+MAX_LOOP_LAG_MS = 250
+LOOP_LAG_SAMPLE_INTERVAL = 0.1
+
+# Facet Settings
+# (label, lower bound inclusive, upper bound exclusive or None)
+PRICE_BUCKETS = [
+    ("Under ₹1,000", 0, 1000),
+    ("₹1,000 - ₹5,000", 1000, 5000),
+    ("₹5,000 - ₹10,000", 5000, 10000),
+    ("₹10,000 - ₹25,000", 10000, 25000),
+    ("₹25,000 - ₹50,000", 25000, 50000),
+    ("Over ₹50,000", 50000, None),
+]
+RATING_BUCKETS = [
+    ("4★ & above", 4, None),
+    ("3★ - 4★", 3, 4),
+    ("2★ - 3★", 2, 3),
+    ("Below 2★", 0, 2),
+]
+
+# Recommendation Settings
+RECOMMENDATION_TOP_K = 20
+RECOMMENDATION_MAX_PAIRS = 2_000_000
+RECOMMENDATION_MAX_NEIGHBORS = 200
+# Pruning drops the lowest-count pairs until this many are left
+RECOMMENDATION_PRUNE_TARGET = 1_500_000
+# Rows visited per order while a pruning sweep is running
+RECOMMENDATION_PRUNE_BATCH = 200
+
+# Analytics Settings
+ANALYTICS_BUCKET_SECONDS = 60
+ANALYTICS_BUCKETS = 1440
+ANALYTICS_QUANTILE_ACCURACY = 0.01
+
+# Inventory Settings
+DEFAULT_STOCK = 100
+INVENTORY_SHARDS = 8
+RESERVATION_TTL_SECONDS = 15 * 60
+
+# Bootstrap Settings
+BOOTSTRAP_TIMEOUT = 2.0
+BOOTSTRAP_SEARCH_LIMIT = 24
+# Seconds each bootstrap section may be reused by clients
+BOOTSTRAP_MAX_AGE = {
+    "categories": 3600,
+    "trending": 300,
+    "search": 60,
+}
+
+# Batch Search Settings
+MAX_BATCH_QUERIES = 20
+BATCH_SEARCH_CONCURRENCY = 4
+
+# Profiling Settings (all off by default; can be toggled at runtime via /api/admin/profiling)
+PROFILING_ENABLED = False
+BLOCKING_THRESHOLD_MS = 100
+PROFILE_SAMPLE_INTERVAL_MS = 5
+PROFILE_HEADER = "x-profile"
+MAX_STORED_PROFILES = 50
+
+# Catalog Snapshot Settings
+# Mapped at startup if present and used before scraping on a search cache miss
+SNAPSHOT_PATH = "catalog.snapshot"
+
+# Event Stream Settings
+EVENT_QUEUE_SIZE = 100
+EVENT_KEEPALIVE_SECONDS = 15
+MAX_EVENT_STREAMS_PER_USER = 5
+MAX_EVENT_SUBSCRIBERS = 20000
@@ -1,21 +1,78 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import requests
 from bs4 import BeautifulSoup
-from typing import List, Optional
+from typing import Callable, List, Optional
 import re
+import hashlib
 from datetime import datetime
 import json
+import asyncio
+import functools
+import time
 
 # Import routes
 from routes.auth import router as auth_router
 from routes.cart import router as cart_router
 from routes.payment import router as payment_router
+from routes.images import router as images_router
+from routes.recommendations import router as recommendations_router
+from routes.admin import router as admin_router
+from routes.inventory import router as inventory_router
+from routes.events import router as events_router
 from services.search_service import SearchService
+from services.facet_service import FacetService
+from services.product_detail_service import ProductDetailService
+from services.image_service import ImageService
+from services.payment_service import PaymentService
+from services.recommendation_service import RecommendationService
+from services.analytics_service import AnalyticsService
+from services.snapshot_service import SnapshotService
+from services.event_service import EventService
+from middleware.rate_limit import RateLimitMiddleware, RateLimitExceeded
+from middleware.profiling import ProfilingMiddleware
+import config
+from models.schemas import SearchQuery, BatchSearchRequest
 
 app = FastAPI(title="ECommerce API", version="2.0")
 
+# Cache for scraped products
+products_cache = {}
+# When each products_cache entry's data was fetched (epoch seconds)
+products_fetched_at = {}
+# Product id -> latest cached product, kept in step with products_cache
+products_by_id = {}
+# Cache entries served from the snapshot until a live scrape replaces them
+stale_search_keys = set()
+# Scrapes in progress, keyed like products_cache
+search_inflight = {}
+
+def search_cache_key(q: str, limit: int) -> str:
+    """Cache key for a search query"""
+    return f"{q}_{min(limit, 100)}".lower()
+
+def cache_search_results(cache_key: str, products: list, fetched_at: float):
+    """Store a query's products in the search cache and the id index"""
+    products_cache[cache_key] = products
+    products_fetched_at[cache_key] = fetched_at
+    stale_search_keys.discard(cache_key)
+    # Replaced results are re-indexed on their next search
+    FacetService.forget_query(cache_key)
+    for product in products:
+        products_by_id[str(product["id"])] = product
+
+def is_search_cached(params: dict) -> bool:
+    """Whether a search request would be served from cache without starting a scrape"""
+    key = search_cache_key(params.get("q", "electronics"), int(params.get("limit", 20)))
+    return key in products_cache and key not in stale_search_keys
+
+# Opt-in request profiling (inside the rate limiter, so shed requests are never sampled)
+app.add_middleware(ProfilingMiddleware)
+
+# Rate limiting and load shedding (added before CORS so rejections still carry CORS headers)
+app.add_middleware(RateLimitMiddleware, search_cache_probe=is_search_cached)
+
 # Enable CORS for frontend access
 app.add_middleware(
     CORSMiddleware,
@@ -29,6 +86,22 @@ app.add_middleware(
 app.include_router(auth_router)
 app.include_router(cart_router)
 app.include_router(payment_router)
+app.include_router(images_router)
+app.include_router(recommendations_router)
+app.include_router(admin_router)
+app.include_router(inventory_router)
+app.include_router(events_router)
+
+# Feed order and payment events to the derived views
+PaymentService.subscribe(RecommendationService.handle_payment_event)
+PaymentService.subscribe(AnalyticsService.handle_payment_event)
+PaymentService.subscribe(EventService.handle_payment_event)
+
+# Serve a realistic catalog from the first request if a snapshot was exported earlier
+try:
+    SnapshotService.load()
+except (OSError, ValueError) as e:
+    print(f"Ignoring unreadable catalog snapshot {config.SNAPSHOT_PATH}: {e}")
 
 class Product(BaseModel):
     id: str
@@ -38,9 +111,7 @@ class Product(BaseModel):
     rating: str = "N/A"
     reviews: str = "0"
     description: Optional[str] = None
-
-# Cache for scraped products
-products_cache = {}
+    category: Optional[str] = None
 
 def get_flipkart_headers():
     """Return headers to mimic a real browser"""
@@ -53,9 +124,12 @@ def get_flipkart_headers():
         'Upgrade-Insecure-Requests': '1'
     }
 
-def scrape_flipkart_search(search_query: str, max_products: int = 20) -> List[Product]:
+def scrape_flipkart_search(search_query: str, max_products: int = 20, fallback: bool = True) -> List[Product]:
     """
     Scrape Flipkart search results for given query
+
+    If the request fails, fallback products are returned, or with
+    fallback=False the error is raised.
     """
     try:
         search_url = f"https://www.flipkart.com/search?q={search_query.replace(' ', '+')}"
@@ -90,8 +164,12 @@ def scrape_flipkart_search(search_query: str, max_products: int = 20) -> List[Pr
                 reviews = review_elem.text.strip() if review_elem else "0"
                 
                 if name and image_url:
+                    # Stable across processes (unlike hash()), since ids outlive
+                    # the process in snapshots, carts and orders
+                    product_id = str(int(hashlib.sha1(product_url.encode()).hexdigest()[:8], 16) % ((2**31) - 1))
+                    ProductDetailService.register_product_url(product_id, product_url)
                     product = Product(
-                        id=hash(product_url) % ((2**31) - 1),
+                        id=product_id,
                         name=name[:100],
                         price=price,
                         image_url=image_url,
@@ -109,7 +187,16 @@ def scrape_flipkart_search(search_query: str, max_products: int = 20) -> List[Pr
         
     except requests.exceptions.RequestException as e:
         print(f"Request error: {e}")
-        return get_mock_products(search_query)
+        if not fallback:
+            raise
+        return get_fallback_products(search_query, max_products)
+
+def get_fallback_products(search_query: str, max_products: int = 20) -> List[Product]:
+    """Products to serve when upstream is unavailable: the snapshot, then mock data"""
+    products = SnapshotService.search(search_query, max_products)
+    if products:
+        return [Product(**product) for product in products]
+    return get_mock_products(search_query)
 
 def get_mock_products(search_query: str = "electronics") -> List[Product]:
     """Return mock products with detailed info"""
@@ -203,7 +290,8 @@ def get_mock_products(search_query: str = "electronics") -> List[Product]:
     }
     
     products = []
-    base_products = mock_data.get(search_query.lower(), mock_data['electronics'])
+    category = search_query.lower() if search_query.lower() in mock_data else 'electronics'
+    base_products = mock_data[category]
     
     for idx, item in enumerate(base_products):
         product = Product(
@@ -213,7 +301,8 @@ def get_mock_products(search_query: str = "electronics") -> List[Product]:
             image_url=item['image_url'],
             rating=item['rating'],
             reviews=item['reviews'],
-            description=item.get('description', 'Great product!')
+            description=item.get('description', 'Great product!'),
+            category=category
         )
         products.append(product)
     
@@ -229,81 +318,251 @@ async def root():
             "auth": "/api/auth/*",
             "cart": "/api/cart/*",
             "payment": "/api/payment/*",
-            "products": "/api/search, /api/categories, /api/trending"
+            "images": "/api/img/{key}?w=",
+            "recommendations": "/api/recommendations/{product_id}",
+            "admin": "/api/admin/stats, /api/admin/profiling, /api/admin/snapshot",
+            "inventory": "/api/inventory/{product_id}",
+            "events": "/api/events/{user_id}",
+            "products": "/api/search, /api/product/{id}, /api/products?ids=, /api/categories, /api/trending",
+            "bootstrap": "/api/bootstrap",
+            "batch_search": "POST /api/search/batch"
         }
     }
 
-@app.get("/api/search")
-async def search_products(q: str = "electronics", limit: int = 20, sort_by: str = "relevant", min_price: float = 0, max_price: float = 100000) -> dict:
-    """Search for products with advanced filtering"""
-    if not q or len(q) < 1:
-        raise HTTPException(status_code=400, detail="Query must be at least 1 character")
-    
-    if limit > 100:
-        limit = 100
-    
-    cache_key = f"{q}_{limit}".lower()
-    
-    # Check cache
+async def load_search_results(q: str, limit: int, semaphore: Optional[asyncio.Semaphore] = None, admit_scrape: Optional[Callable[[], float]] = None) -> tuple:
+    """Products for a query from cache, the snapshot, or a scrape; returns (products, cache status)
+
+    Snapshot products are served until a background scrape replaces them.
+
+    `admit_scrape` is called before starting a new scrape and returns 0 to
+    allow it or a retry delay, in which case RateLimitExceeded is raised
+    (a snapshot refresh is just skipped).
+    """
+    cache_key = search_cache_key(q, limit)
+
+    # A loaded snapshot answers cold queries without waiting on upstream
+    if cache_key not in products_cache:
+        snapshot_products = SnapshotService.search(q, min(limit, 100))
+        if snapshot_products:
+            cache_search_results(cache_key, snapshot_products, SnapshotService.snapshot.created_at)
+            stale_search_keys.add(cache_key)
+            # The snapshot matched these word by word; the default substring
+            # filter would drop them all for a multi-word query
+            FacetService.index_products(cache_key, q, snapshot_products, matching=snapshot_products)
+
     if cache_key in products_cache:
-        products = products_cache[cache_key]
-        cached = True
-    else:
-        products = scrape_flipkart_search(q, limit)
-        products_cache[cache_key] = [p.dict() for p in products]
-        cached = False
-    
-    # Convert to dict for processing
-    products_list = [p.dict() if hasattr(p, 'dict') else p for p in products]
-    
-    # Apply search filter
-    products_list = SearchService.search_products(products_list, q)
-    
-    # Apply price filter
-    products_list = SearchService.filter_by_price(products_list, min_price, max_price)
+        if cache_key not in stale_search_keys:
+            return products_cache[cache_key], "hit"
+        # Serve the snapshot's products now and replace them with a live
+        # scrape in the background, retried on later requests until one
+        # is admitted and succeeds
+        if cache_key not in search_inflight and (admit_scrape is None or not admit_scrape()):
+            search_inflight[cache_key] = asyncio.ensure_future(scrape_search(q, limit, semaphore, refresh=True))
+        return products_cache[cache_key], "snapshot"
+
+    # Concurrent misses for the same query share one scrape
+    task = search_inflight.get(cache_key)
+    if task is not None:
+        return await asyncio.shield(task), "coalesced"
+
+    if admit_scrape is not None:
+        retry_after = admit_scrape()
+        if retry_after:
+            raise RateLimitExceeded(retry_after)
+
+    task = search_inflight[cache_key] = asyncio.ensure_future(scrape_search(q, limit, semaphore))
+    return await asyncio.shield(task), "miss"
+
+async def scrape_search(q: str, limit: int, semaphore: Optional[asyncio.Semaphore] = None, refresh: bool = False) -> list:
+    """Scrape a query into the search cache; a refresh keeps the cached products if upstream fails"""
+    cache_key = search_cache_key(q, limit)
+    try:
+        # Scrape in a worker thread so other requests keep being served
+        loop = asyncio.get_running_loop()
+        scrape = functools.partial(scrape_flipkart_search, q, limit, fallback=not refresh)
+        try:
+            if semaphore is None:
+                scraped = await loop.run_in_executor(None, scrape)
+            else:
+                async with semaphore:
+                    scraped = await loop.run_in_executor(None, scrape)
+        except requests.exceptions.RequestException:
+            # Only a refresh raises; it keeps serving the snapshot's products
+            return products_cache[cache_key]
+        if refresh and not scraped:
+            return products_cache[cache_key]
+        cache_search_results(cache_key, [p.dict() for p in scraped], time.time())
+        return products_cache[cache_key]
+    finally:
+        search_inflight.pop(cache_key, None)
+
+def build_search_response(request: Request, q: str, limit: int, products: list, cached: bool, sort_by: str, min_price: float, max_price: float, min_rating: float, category: Optional[str]) -> dict:
+    """Filter, facet, sort and limit a query's products into the search response"""
+    cache_key = search_cache_key(q, limit)
+
+    # Apply search, price, rating and category filters as bitmap intersections
+    FacetService.index_products(cache_key, q, products)
+    products_list, facets = FacetService.facet_search(cache_key, min_price, max_price, min_rating, category)
     
     # Apply sorting
     products_list = SearchService.sort_products(products_list, sort_by)
     
     # Limit results
     products_list = products_list[:limit]
+
+    # Serve images through the local resizing proxy
+    products_list = ImageService.rewrite_products(products_list, str(request.base_url))
     
     return {
         "query": q,
         "products": products_list,
         "cached": cached,
+        "fetched_at": datetime.fromtimestamp(products_fetched_at.get(cache_key, time.time())).isoformat(),
         "count": len(products_list),
+        "facets": facets,
         "filters": {
             "min_price": min_price,
             "max_price": max_price,
+            "min_rating": min_rating,
+            "category": category,
             "sort_by": sort_by
         }
     }
 
+@app.get("/api/search")
+async def search_products(request: Request, q: str = "electronics", limit: int = 20, sort_by: str = "relevant", min_price: float = 0, max_price: float = 100000, min_rating: float = 0, category: Optional[str] = None) -> dict:
+    """Search for products with advanced filtering"""
+    if not q or len(q) < 1:
+        raise HTTPException(status_code=400, detail="Query must be at least 1 character")
+    
+    if limit > 100:
+        limit = 100
+    
+    products, cache_status = await load_search_results(q, limit)
+    return build_search_response(request, q, limit, products, cache_status == "hit", sort_by, min_price, max_price, min_rating, category)
+
+@app.post("/api/search/batch")
+async def search_batch(request: Request, batch: BatchSearchRequest) -> dict:
+    """Run several searches in one request with a shared upstream scrape budget"""
+    if len(batch.queries) > config.MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {config.MAX_BATCH_QUERIES} queries per batch")
+
+    # Cache hits are answered immediately; only misses wait on this budget
+    semaphore = asyncio.Semaphore(max(1, min(batch.concurrency, config.BATCH_SEARCH_CONCURRENCY)))
+    # Each scrape costs a search_miss token, as it would as its own request
+    rate_limit = getattr(request.state, "rate_limit", None)
+    admit_scrape = (lambda: rate_limit("search_miss")) if rate_limit else None
+
+    async def run(query: SearchQuery) -> dict:
+        started = time.perf_counter()
+        if not query.q:
+            return {"status": "error", "error": "Query must be at least 1 character", "elapsed_ms": 0.0}
+        limit = min(query.limit, 100)
+        try:
+            products, cache_status = await load_search_results(query.q, limit, semaphore, admit_scrape)
+            result = build_search_response(
+                request, query.q, limit, products, cache_status == "hit", query.sort_by,
+                query.min_price, query.max_price, query.min_rating, query.category
+            )
+        except RateLimitExceeded as e:
+            return {"status": "rate_limited", "retry_after": round(e.retry_after, 2), "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)}
+        except Exception as e:
+            return {"status": "error", "error": str(e), "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)}
+        return {
+            "status": "ok",
+            "cache": cache_status,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "result": result
+        }
+
+    # Identical queries in the batch are computed once
+    tasks = {}
+    keys = []
+    for query in batch.queries:
+        key = query.model_copy(update={"q": query.q.lower(), "limit": min(query.limit, 100)}).model_dump_json()
+        if key not in tasks:
+            tasks[key] = asyncio.ensure_future(run(query))
+        keys.append(key)
+
+    started = time.perf_counter()
+    await asyncio.gather(*tasks.values())
+
+    results = []
+    seen = set()
+    for query, key in zip(batch.queries, keys):
+        entry = {"query": query.model_dump(), **tasks[key].result(), "deduplicated": key in seen}
+        seen.add(key)
+        results.append(entry)
+
+    return {
+        "results": results,
+        "count": len(results),
+        "unique_queries": len(tasks),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+def find_product(product_id: str) -> Optional[dict]:
+    """Look up a product in cached search results, then in mock data"""
+    product = products_by_id.get(product_id)
+    if product:
+        return product
+
+    product = SnapshotService.find_product(product_id)
+    if product:
+        return product
+
+    for product in get_mock_products("electronics"):
+        if str(product.id) == product_id:
+            return product.dict()
+
+    return None
+
 @app.get("/api/product/{product_id}")
 async def get_product_details(product_id: str) -> dict:
     """Get detailed product information"""
-    # Search in cache or mock data
-    all_products = get_mock_products("electronics")
-    
-    for product in all_products:
-        if str(product.id) == product_id:
-            return {
-                "product": product.dict(),
-                "specifications": {
-                    "warranty": "1 year manufacturer warranty",
-                    "return_policy": "30 days return",
-                    "delivery": "Free delivery across India",
-                    "seller": "Authorized Seller",
-                    "cod_available": True
-                },
-                "offers": [
-                    {"text": "₹3,315 off with Credit Card", "code": "CARD3K"},
-                    {"text": "₹1,000 off with Debit Card", "code": "DB1000"}
-                ]
-            }
-    
-    raise HTTPException(status_code=404, detail="Product not found")
+    product = find_product(product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    try:
+        entry = await ProductDetailService.get_details(product, get_flipkart_headers())
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out fetching product details")
+
+    return {
+        "product": entry["product"],
+        "specifications": entry["specifications"],
+        "offers": entry["offers"]
+    }
+
+@app.get("/api/products")
+async def get_products_batch(ids: str, timeout: float = config.DETAIL_FETCH_TIMEOUT) -> dict:
+    """Get detailed information for many products in one request"""
+    product_ids = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if not product_ids:
+        raise HTTPException(status_code=400, detail="At least one product id is required")
+
+    product_ids = product_ids[:config.MAX_BATCH_PRODUCTS]
+    timeout = min(max(timeout, 0.1), config.DETAIL_FETCH_TIMEOUT)
+
+    products = []
+    missing = []
+    for product_id in product_ids:
+        product = find_product(product_id)
+        if product:
+            products.append(product)
+        else:
+            missing.append(product_id)
+
+    entries, errors = await ProductDetailService.get_many(products, get_flipkart_headers(), timeout)
+
+    return {
+        "products": entries,
+        "count": len(entries),
+        "missing": missing,
+        "errors": errors,
+        "partial": bool(missing or errors)
+    }
 
 @app.get("/api/categories")
 async def get_categories():
@@ -322,15 +581,75 @@ async def get_categories():
     }
 
 @app.get("/api/trending")
-async def get_trending():
+async def get_trending(request: Request):
     """Get trending products"""
     trending = get_mock_products("electronics")
     return {
-        "trending": [p.dict() for p in trending[:6]],
+        "trending": ImageService.rewrite_products([p.dict() for p in trending[:6]], str(request.base_url)),
         "title": "Trending Now",
         "last_updated": datetime.now().isoformat()
     }
 
+@app.get("/api/bootstrap")
+async def bootstrap(request: Request, response: Response, q: str = "electronics", limit: int = config.BOOTSTRAP_SEARCH_LIMIT, timeout: float = config.BOOTSTRAP_TIMEOUT) -> dict:
+    """Categories, trending and the default search for the initial page load in one request"""
+    tasks = {
+        "categories": asyncio.ensure_future(get_categories()),
+        "trending": asyncio.ensure_future(get_trending(request)),
+        "search": asyncio.ensure_future(search_products(request, q=q, limit=limit)),
+    }
+
+    # Answer with whatever is ready by the deadline; slower sections keep
+    # running in the background and warm the cache for the next request
+    await asyncio.wait(tasks.values(), timeout=min(max(timeout, 0.1), config.BOOTSTRAP_TIMEOUT))
+
+    sections = {}
+    for name, task in tasks.items():
+        section = {"max_age": config.BOOTSTRAP_MAX_AGE[name]}
+        if not task.done():
+            section["status"] = "pending"
+        elif task.exception() is not None:
+            section["status"] = "error"
+            error = task.exception()
+            section["error"] = error.detail if isinstance(error, HTTPException) else str(error)
+        else:
+            section["status"] = "ok"
+            data = section["data"] = task.result()
+            # When the data itself was fetched, e.g. when a cached search was scraped
+            section["fetched_at"] = data.get("fetched_at") or data.get("last_updated") or datetime.now().isoformat()
+        sections[name] = section
+
+    complete = all(section["status"] == "ok" for section in sections.values())
+    if complete:
+        max_age = min(section["max_age"] for section in sections.values())
+        response.headers["Cache-Control"] = f"public, max-age={max_age}"
+    else:
+        response.headers["Cache-Control"] = "no-store"
+
+    return {
+        "sections": sections,
+        "partial": not complete
+    }
+
+@app.get("/api/admin/snapshot")
+async def get_snapshot_status():
+    """Currently mapped catalog snapshot"""
+    return SnapshotService.status()
+
+@app.post("/api/admin/snapshot")
+async def export_snapshot():
+    """Write every cached product (merged with the current snapshot) to SNAPSHOT_PATH and map it"""
+    # Entries still served from the snapshot add nothing it doesn't have
+    products = [
+        product
+        for cache_key, cached in list(products_cache.items()) if cache_key not in stale_search_keys
+        for product in cached
+    ]
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, SnapshotService.export, products, dict(ProductDetailService.product_urls)
+    )
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -0,0 +1 @@
+# Backend middleware __init__.py
@@ -0,0 +1,63 @@
+import time
+
+import config
+from services.profiling_service import ProfilingService
+
+
+class ProfilingMiddleware:
+    """Per-request sampling profiler, opt in with the profile header.
+
+    While profiling is disabled this is a single attribute check per
+    request. When enabled, a request sent with `X-Profile: 1` has the event
+    loop thread sampled for its duration; the response carries an
+    `X-Profile-Id` whose folded stacks can be fetched from
+    /api/admin/profiles/{id}. Samples cover everything the loop ran
+    meanwhile, including other concurrent requests.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.header = config.PROFILE_HEADER.lower().encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        ProfilingService.ensure_started()
+        if not ProfilingService.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        if not any(name == self.header and value not in (b"", b"0") for name, value in scope.get("headers", [])):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = ProfilingService.start_profile()
+        started = time.perf_counter()
+        response_start = None
+
+        async def send_with_profile(message):
+            nonlocal response_start
+            # Hold the headers back until the body is complete so the profile
+            # id can be added once sampling has stopped
+            if message["type"] == "http.response.start":
+                response_start = message
+                return
+            if response_start is not None:
+                if not message.get("more_body", False):
+                    profile_id = ProfilingService.finish_profile(
+                        sampler, scope["path"], (time.perf_counter() - started) * 1000
+                    )
+                    response_start["headers"] = list(response_start.get("headers", [])) + [
+                        (b"x-profile-id", profile_id.encode())
+                    ]
+                await send(response_start)
+                response_start = None
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            # Streaming responses and errors end up here without a stored profile
+            sampler.stop()
@@ -0,0 +1,152 @@
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+from urllib.parse import parse_qs
+
+import config
+from services.profiling_service import ProfilingService
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__("Too many requests")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, capacity: float, now: float):
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, rate: float, capacity: float, now: float) -> float:
+        """Take one token; return 0 on success or seconds until one is available"""
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / rate
+
+
+class RateLimiter:
+    """Token buckets keyed by (client, route class) in a bounded LRU table.
+
+    When the table is full the least recently seen bucket is dropped; that
+    client simply starts again with a full bucket.
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[float, int]], max_clients: int):
+        self.limits = limits
+        self.max_clients = max_clients
+        self.buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+
+    def check(self, client: str, route_class: str, now: float = None) -> float:
+        """Return 0 if the request is allowed, else the suggested retry delay"""
+        rate, burst = self.limits.get(route_class, self.limits["default"])
+        if now is None:
+            now = time.monotonic()
+
+        key = (client, route_class)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(burst, now)
+            self.buckets[key] = bucket
+            if len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+
+        return bucket.take(rate, burst, now)
+
+
+class RateLimitMiddleware:
+    """Per-client rate limiting plus load shedding on queue depth and loop lag"""
+
+    EXEMPT_PATHS = ("/health",)
+    # Long-lived streams are rate limited on connect but don't count as
+    # in-flight work, or a few thousand idle listeners would shed everything
+    STREAMING_PREFIXES = ("/api/events/",)
+
+    def __init__(self, app, search_cache_probe: Callable[[dict], bool] = None, limiter: RateLimiter = None):
+        self.app = app
+        self.search_cache_probe = search_cache_probe
+        self.limiter = limiter or RateLimiter(config.RATE_LIMITS, config.RATE_LIMIT_MAX_CLIENTS)
+        self.lag_monitor = ProfilingService.lag_monitor
+        self.inflight = 0
+
+    def client_key(self, scope) -> str:
+        if config.TRUST_FORWARDED_FOR:
+            for name, value in scope.get("headers", []):
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def route_class(self, scope) -> str:
+        path = scope["path"]
+        if path in ("/api/search", "/api/bootstrap"):
+            # Bootstrap runs the same search, so it draws on the same budgets
+            if self.search_cache_probe is None:
+                return "search_miss"
+            params = {k: v[0] for k, v in parse_qs(scope.get("query_string", b"").decode("latin-1")).items()}
+            if path == "/api/bootstrap":
+                params.setdefault("limit", str(config.BOOTSTRAP_SEARCH_LIMIT))
+            try:
+                cached = self.search_cache_probe(params)
+            except ValueError:
+                cached = False
+            return "search_hit" if cached else "search_miss"
+        if path.startswith("/api/payment/") and scope.get("method") == "POST":
+            return "payment"
+        return "default"
+
+    async def reject(self, send, status: int, detail: str, retry_after: float):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not config.RATE_LIMIT_ENABLED or scope["path"] in self.EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        self.lag_monitor.ensure_started()
+
+        if self.inflight >= config.MAX_INFLIGHT_REQUESTS:
+            await self.reject(send, 503, "Server busy, please retry", 1)
+            return
+        if self.lag_monitor.lag_ms > config.MAX_LOOP_LAG_MS:
+            await self.reject(send, 503, "Server overloaded, please retry", 1)
+            return
+
+        client = self.client_key(scope)
+        retry_after = self.limiter.check(client, self.route_class(scope))
+        if retry_after:
+            await self.reject(send, 429, "Too many requests", retry_after)
+            return
+
+        # Lets a route charge extra tokens for work it fans out, e.g. each
+        # scrape in a batch search (read as request.state.rate_limit)
+        scope.setdefault("state", {})["rate_limit"] = lambda route_class: self.limiter.check(client, route_class)
+
+        if scope["path"].startswith(self.STREAMING_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        self.inflight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.inflight -= 1
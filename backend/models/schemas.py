@@ -68,3 +68,16 @@ class PaymentResponse(BaseModel):
     transaction_id: Optional[str] = None
     order_id: Optional[str] = None
     amount: float
+
+class SearchQuery(BaseModel):
+    q: str
+    limit: int = 20
+    sort_by: str = "relevant"
+    min_price: float = 0
+    max_price: float = 100000
+    min_rating: float = 0
+    category: Optional[str] = None
+
+class BatchSearchRequest(BaseModel):
+    queries: list[SearchQuery]
+    concurrency: int = 4
@@ -0,0 +1,33 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from services.analytics_service import AnalyticsService
+from services.profiling_service import ProfilingService
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+@router.get("/stats")
+async def get_stats(window: int = 3600):
+    """Order, revenue and payment outcome aggregates for a recent window"""
+    return AnalyticsService.get_stats(max(1, window))
+
+@router.get("/profiling")
+async def get_profiling():
+    """Loop lag, recent blocking-call stacks and stored request profiles"""
+    return ProfilingService.status()
+
+@router.post("/profiling")
+async def set_profiling(enabled: bool, blocking_threshold_ms: Optional[float] = None):
+    """Turn the blocking-call detector and per-request profiling on or off"""
+    if blocking_threshold_ms is not None and blocking_threshold_ms <= 0:
+        raise HTTPException(status_code=400, detail="blocking_threshold_ms must be positive")
+    ProfilingService.set_enabled(enabled, blocking_threshold_ms)
+    return ProfilingService.status()
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str):
+    """Folded stacks for one profiled request, ready for flamegraph.pl or speedscope"""
+    profile = ProfilingService.profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile["folded"]
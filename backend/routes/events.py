@@ -0,0 +1,54 @@
+import asyncio
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from services.cart_service import CartService
+from services.event_service import EventService
+import config
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+@router.get("/{user_id}")
+async def stream_events(user_id: str):
+    """Server-sent events for a user's cart changes and order/payment status"""
+    # Checked up front so over-limit clients get a 503 rather than an empty
+    # stream; the subscription itself is taken inside the generator so a
+    # client that disconnects before streaming starts never leaks one
+    if not EventService.can_subscribe(user_id):
+        raise HTTPException(status_code=503, detail="Too many open event streams")
+
+    async def events():
+        try:
+            subscription = EventService.subscribe(user_id)
+        except ValueError as e:
+            # Lost a race for the last slot since the check above
+            yield EventService.format("error", {"detail": str(e)})
+            return
+        try:
+            # Start with the full cart so the client needs no separate fetch;
+            # everything after it is a diff
+            yield "retry: 3000\n\n"
+            yield EventService.format("cart.snapshot", CartService.get_cart(user_id))
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), config.EVENT_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield message
+                if subscription.overflowed and subscription.queue.empty():
+                    # The client reconnects and starts again from a snapshot
+                    return
+        finally:
+            EventService.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("")
+async def get_event_stats():
+    """Open event stream counts"""
+    return EventService.status()
@@ -0,0 +1,26 @@
+import requests
+from fastapi import APIRouter, HTTPException, Request, Response
+from services.image_service import ImageService
+
+router = APIRouter(prefix="/api/img", tags=["images"])
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+@router.get("/{key}")
+async def get_image(key: str, request: Request, w: int = 0):
+    """Serve a cached, resized copy of a product image"""
+    try:
+        data, content_type, digest = await ImageService.get_image(key, w)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Image not found")
+    except (requests.exceptions.RequestException, ValueError) as e:
+        raise HTTPException(status_code=502, detail=f"Could not fetch image: {e}")
+
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=data, media_type=content_type, headers=headers)
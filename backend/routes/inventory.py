@@ -0,0 +1,17 @@
+from fastapi import APIRouter, HTTPException
+from services.inventory_service import InventoryService
+
+router = APIRouter(prefix="/api/inventory", tags=["inventory"])
+
+@router.get("/{product_id}")
+async def get_stock(product_id: str):
+    """Get available and sold stock for a product"""
+    return InventoryService.get_stock(product_id)
+
+@router.put("/{product_id}")
+async def set_stock(product_id: str, stock: int):
+    """Set available stock for a product"""
+    if stock < 0:
+        raise HTTPException(status_code=400, detail="Stock cannot be negative")
+    InventoryService.set_stock(product_id, stock)
+    return InventoryService.get_stock(product_id)
@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from services.recommendation_service import RecommendationService
+
+router = APIRouter(prefix="/api/recommendations", tags=["recommendations"])
+
+@router.get("/{product_id}")
+async def get_recommendations(product_id: str, k: int = 5):
+    """Get products frequently bought together with a product"""
+    k = max(1, min(k, 20))
+    recommendations = RecommendationService.get_recommendations(product_id, k)
+    return {
+        "product_id": product_id,
+        "recommendations": recommendations,
+        "count": len(recommendations)
+    }
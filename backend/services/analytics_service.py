@@ -0,0 +1,147 @@
+import math
+import time
+from typing import Dict, List, Optional
+
+import config
+
+
+class QuantileSketch:
+    """Log-bucketed histogram with bounded relative error (DDSketch-style).
+
+    A value v lands in bucket ceil(log_gamma(v)); any quantile read back is
+    within `accuracy` of the true value relative to its size, and memory
+    grows with the log of the value range, not the number of samples.
+    """
+
+    def __init__(self, accuracy: float):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float):
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class AnalyticsService:
+    # Ring buffers indexed by (epoch // bucket width) % bucket count. A slot
+    # is reset lazily when its period comes round again.
+    periods: List[int] = [-1] * config.ANALYTICS_BUCKETS
+    revenue: List[float] = [0.0] * config.ANALYTICS_BUCKETS
+    orders: List[int] = [0] * config.ANALYTICS_BUCKETS
+    # payment_method -> [successes, failures], one dict per slot
+    payments: List[Dict[str, List[int]]] = [{} for _ in range(config.ANALYTICS_BUCKETS)]
+
+    order_values = QuantileSketch(config.ANALYTICS_QUANTILE_ACCURACY)
+    totals = {"orders": 0, "revenue": 0.0, "payments": 0}
+
+    @staticmethod
+    def _slot(now: float) -> int:
+        """Ring position for a timestamp, clearing it if it holds an old period"""
+        period = int(now // config.ANALYTICS_BUCKET_SECONDS)
+        slot = period % config.ANALYTICS_BUCKETS
+        if AnalyticsService.periods[slot] != period:
+            AnalyticsService.periods[slot] = period
+            AnalyticsService.revenue[slot] = 0.0
+            AnalyticsService.orders[slot] = 0
+            AnalyticsService.payments[slot] = {}
+        return slot
+
+    @staticmethod
+    def record_order(total_price: float, now: float = None):
+        """Count a newly created order"""
+        slot = AnalyticsService._slot(time.time() if now is None else now)
+        AnalyticsService.orders[slot] += 1
+        AnalyticsService.totals["orders"] += 1
+        AnalyticsService.order_values.add(float(total_price or 0))
+
+    @staticmethod
+    def record_payment(amount: float, payment_method: str, success: bool, now: float = None):
+        """Count a payment attempt and, if it succeeded, its revenue"""
+        slot = AnalyticsService._slot(time.time() if now is None else now)
+        outcome = AnalyticsService.payments[slot].setdefault(payment_method, [0, 0])
+        outcome[0 if success else 1] += 1
+        AnalyticsService.totals["payments"] += 1
+        if success:
+            AnalyticsService.revenue[slot] += amount
+            AnalyticsService.totals["revenue"] += amount
+
+    @staticmethod
+    def handle_payment_event(event: str, payload: dict):
+        """PaymentService listener"""
+        if event == "order.created":
+            AnalyticsService.record_order(payload["order"]["total_price"])
+        elif event == "payment.processed":
+            transaction = payload["transaction"]
+            AnalyticsService.record_payment(
+                transaction["amount"], transaction["payment_method"], transaction["status"] == "success"
+            )
+
+    @staticmethod
+    def get_stats(window_seconds: int = 3600, now: float = None) -> dict:
+        """Aggregate the last `window_seconds`; cost is O(buckets in window)"""
+        if now is None:
+            now = time.time()
+        width = config.ANALYTICS_BUCKET_SECONDS
+        bucket_count = min(config.ANALYTICS_BUCKETS, max(1, math.ceil(window_seconds / width)))
+        current = int(now // width)
+
+        revenue = 0.0
+        orders = 0
+        payments: Dict[str, List[int]] = {}
+        for period in range(current - bucket_count + 1, current + 1):
+            slot = period % config.ANALYTICS_BUCKETS
+            if AnalyticsService.periods[slot] != period:
+                continue
+            revenue += AnalyticsService.revenue[slot]
+            orders += AnalyticsService.orders[slot]
+            for method, (success, failed) in AnalyticsService.payments[slot].items():
+                outcome = payments.setdefault(method, [0, 0])
+                outcome[0] += success
+                outcome[1] += failed
+
+        sketch = AnalyticsService.order_values
+        return {
+            "window_seconds": bucket_count * width,
+            "orders": orders,
+            "revenue": round(revenue, 2),
+            "payments": {
+                method: {
+                    "success": success,
+                    "failed": failed,
+                    "failure_rate": round(failed / (success + failed), 4)
+                }
+                for method, (success, failed) in payments.items()
+            },
+            # Quantiles cover every order since startup, not just the window
+            "totals": {
+                **AnalyticsService.totals,
+                "order_value_quantiles": {
+                    name: (round(value, 2) if value is not None else None)
+                    for name, value in (
+                        ("p50", sketch.quantile(0.5)),
+                        ("p90", sketch.quantile(0.9)),
+                        ("p99", sketch.quantile(0.99))
+                    )
+                }
+            }
+        }
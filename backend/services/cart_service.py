@@ -1,101 +1,115 @@
 import hashlib
 from typing import List, Optional, Dict
 from models.schemas import CartItem, Cart
-from datetime import datetime
+from services.records import CartLine, CartRecord, epoch_to_iso, intern_product, now_epoch
+from services.event_service import EventService
 
 class CartService:
-    carts_db: Dict[str, dict] = {}
+    # Carts are stored as compact records and only turned into the API's
+    # dict shape when returned
+    carts_db: Dict[str, CartRecord] = {}
+
+    @staticmethod
+    def _get_record(user_id: str) -> CartRecord:
+        """Get or create the stored cart record"""
+        cart = CartService.carts_db.get(user_id)
+        if cart is None:
+            cart = CartService.carts_db[user_id] = CartRecord(user_id, now_epoch())
+        return cart
 
     @staticmethod
     def get_cart(user_id: str) -> dict:
         """Get user's cart"""
-        if user_id not in CartService.carts_db:
-            CartService.carts_db[user_id] = {
-                "user_id": user_id,
-                "items": [],
-                "total_price": 0.0,
-                "created_at": datetime.now().isoformat(),
-                "updated_at": datetime.now().isoformat()
-            }
-        return CartService.carts_db[user_id]
+        return CartService._get_record(user_id).to_dict()
 
     @staticmethod
     def add_to_cart(user_id: str, product_id: str, product_name: str, price: str, quantity: int, image_url: str) -> dict:
         """Add item to cart"""
-        cart = CartService.get_cart(user_id)
-        
+        cart = CartService._get_record(user_id)
+
         # Check if item already exists
-        for item in cart["items"]:
-            if item["product_id"] == product_id:
-                item["quantity"] += quantity
+        for line in cart.lines:
+            if line.product.product_id == product_id:
+                line.quantity += quantity
                 CartService._update_total(cart)
-                cart["updated_at"] = datetime.now().isoformat()
-                return cart
-        
+                cart.updated_at = now_epoch()
+                CartService._publish(cart, [line.to_dict()])
+                return cart.to_dict()
+
         # Add new item
-        new_item = {
-            "product_id": product_id,
-            "product_name": product_name,
-            "price": price,
-            "quantity": quantity,
-            "image_url": image_url
-        }
-        
-        cart["items"].append(new_item)
+        product = intern_product(product_id, product_name, price, image_url)
+        line = CartLine(product, quantity)
+        cart.lines.append(line)
         CartService._update_total(cart)
-        cart["updated_at"] = datetime.now().isoformat()
-        
-        return cart
+        cart.updated_at = now_epoch()
+        CartService._publish(cart, [line.to_dict()])
+
+        return cart.to_dict()
 
     @staticmethod
     def remove_from_cart(user_id: str, product_id: str) -> dict:
         """Remove item from cart"""
-        cart = CartService.get_cart(user_id)
-        cart["items"] = [item for item in cart["items"] if item["product_id"] != product_id]
+        cart = CartService._get_record(user_id)
+        cart.lines = [line for line in cart.lines if line.product.product_id != product_id]
         CartService._update_total(cart)
-        cart["updated_at"] = datetime.now().isoformat()
-        return cart
+        cart.updated_at = now_epoch()
+        CartService._publish(cart, [CartService._removed(product_id)])
+        return cart.to_dict()
 
     @staticmethod
     def update_quantity(user_id: str, product_id: str, quantity: int) -> dict:
         """Update item quantity"""
-        cart = CartService.get_cart(user_id)
-        
-        for item in cart["items"]:
-            if item["product_id"] == product_id:
+        cart = CartService._get_record(user_id)
+        changes = []
+
+        for line in cart.lines:
+            if line.product.product_id == product_id:
                 if quantity <= 0:
-                    CartService.remove_from_cart(user_id, product_id)
+                    cart.lines.remove(line)
+                    changes.append(CartService._removed(product_id))
                 else:
-                    item["quantity"] = quantity
+                    line.quantity = quantity
+                    changes.append(line.to_dict())
                 break
-        
+
         CartService._update_total(cart)
-        cart["updated_at"] = datetime.now().isoformat()
-        return cart
+        cart.updated_at = now_epoch()
+        CartService._publish(cart, changes)
+        return cart.to_dict()
 
     @staticmethod
     def clear_cart(user_id: str) -> dict:
         """Clear user's cart"""
-        CartService.carts_db[user_id] = {
-            "user_id": user_id,
-            "items": [],
-            "total_price": 0.0,
-            "created_at": datetime.now().isoformat(),
-            "updated_at": datetime.now().isoformat()
-        }
-        return CartService.carts_db[user_id]
+        previous = CartService.carts_db.get(user_id)
+        cart = CartService.carts_db[user_id] = CartRecord(user_id, now_epoch())
+        if previous is not None:
+            CartService._publish(cart, [CartService._removed(line.product.product_id) for line in previous.lines])
+        return cart.to_dict()
 
     @staticmethod
-    def _update_total(cart: dict):
+    def _update_total(cart: CartRecord):
         """Calculate total price"""
         total = 0.0
-        for item in cart["items"]:
-            # Extract numeric price
-            price_str = item["price"].replace("₹", "").replace(",", "").strip()
-            try:
-                price = float(price_str)
-                total += price * item["quantity"]
-            except ValueError:
-                pass
-        
-        cart["total_price"] = round(total, 2)
+        for line in cart.lines:
+            # Numeric price is parsed once per interned product
+            if line.product.unit_price is not None:
+                total += line.product.unit_price * line.quantity
+
+        cart.total_price = round(total, 2)
+
+    @staticmethod
+    def _removed(product_id: str) -> dict:
+        """Diff entry for a line that left the cart"""
+        return {"product_id": product_id, "quantity": 0}
+
+    @staticmethod
+    def _publish(cart: CartRecord, changes: list):
+        """Push changed lines (quantity 0 means removed) and the new total to open event streams"""
+        if not EventService.is_subscribed(cart.user_id):
+            return
+        EventService.publish(cart.user_id, "cart.updated", {
+            "changes": changes,
+            "total_price": cart.total_price,
+            "item_count": len(cart.lines),
+            "updated_at": epoch_to_iso(cart.updated_at)
+        })
@@ -0,0 +1,130 @@
+import asyncio
+import json
+from typing import Dict, Optional, Set
+
+import config
+
+
+class Subscription:
+    """One open event stream: a bounded queue on the loop that owns it"""
+
+    __slots__ = ("user_id", "queue", "loop", "overflowed")
+
+    def __init__(self, user_id: str, loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=config.EVENT_QUEUE_SIZE)
+        self.loop = loop
+        self.overflowed = False
+
+    def deliver(self, message: str):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A client this far behind has missed diffs it can't recover
+            # from; drop the backlog and tell it to refetch instead
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(EventService.format("resync", {"reason": "overflow"}))
+
+
+class EventService:
+    """In-process pub/sub of per-user events for server-sent event streams.
+
+    Publishing formats a message once and drops it into each of the user's
+    subscription queues without blocking; a user with no open stream costs
+    nothing. Each user's events carry an increasing id so a client can
+    tell whether it missed any.
+    """
+
+    subscribers: Dict[str, Set[Subscription]] = {}
+    sequences: Dict[str, int] = {}
+    subscription_count = 0
+
+    @staticmethod
+    def format(event: str, data: dict, event_id: Optional[int] = None) -> str:
+        """Render one server-sent event"""
+        lines = f"id: {event_id}\n" if event_id is not None else ""
+        return f"{lines}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+    @staticmethod
+    def can_subscribe(user_id: str) -> bool:
+        """Whether subscribe() would currently succeed for this user"""
+        return (
+            EventService.subscription_count < config.MAX_EVENT_SUBSCRIBERS
+            and len(EventService.subscribers.get(user_id, ())) < config.MAX_EVENT_STREAMS_PER_USER
+        )
+
+    @staticmethod
+    def subscribe(user_id: str) -> Subscription:
+        """Open a subscription; raises ValueError when stream limits are reached"""
+        if EventService.subscription_count >= config.MAX_EVENT_SUBSCRIBERS:
+            raise ValueError("Too many open event streams")
+        if len(EventService.subscribers.get(user_id, ())) >= config.MAX_EVENT_STREAMS_PER_USER:
+            raise ValueError("Too many open event streams for this user")
+
+        subscription = Subscription(user_id, asyncio.get_running_loop())
+        EventService.subscribers.setdefault(user_id, set()).add(subscription)
+        EventService.subscription_count += 1
+        return subscription
+
+    @staticmethod
+    def unsubscribe(subscription: Subscription):
+        subscriptions = EventService.subscribers.get(subscription.user_id)
+        if subscriptions is None or subscription not in subscriptions:
+            return
+        subscriptions.discard(subscription)
+        EventService.subscription_count -= 1
+        if not subscriptions:
+            del EventService.subscribers[subscription.user_id]
+            EventService.sequences.pop(subscription.user_id, None)
+
+    @staticmethod
+    def is_subscribed(user_id: str) -> bool:
+        """Whether publishing to a user would reach anyone (lets callers skip building events)"""
+        return user_id in EventService.subscribers
+
+    @staticmethod
+    def publish(user_id: str, event: str, data: dict):
+        """Send an event to every open stream of a user (safe to call from any thread)"""
+        subscriptions = EventService.subscribers.get(user_id)
+        if not subscriptions:
+            return
+
+        sequence = EventService.sequences.get(user_id, 0) + 1
+        EventService.sequences[user_id] = sequence
+        message = EventService.format(event, data, sequence)
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for subscription in list(subscriptions):
+            if subscription.loop is running:
+                subscription.deliver(message)
+            else:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+
+    @staticmethod
+    def handle_payment_event(event: str, payload: dict):
+        """PaymentService listener: push order and payment status transitions"""
+        order = payload["order"]
+        data = {
+            "order_id": order["id"],
+            "order_status": order["order_status"],
+            "payment_status": order["payment_status"]
+        }
+        if event == "payment.processed":
+            transaction = payload["transaction"]
+            data["transaction_id"] = transaction["id"]
+            data["transaction_status"] = transaction["status"]
+        EventService.publish(order["user_id"], event, data)
+
+    @staticmethod
+    def status() -> dict:
+        return {
+            "users": len(EventService.subscribers),
+            "streams": EventService.subscription_count
+        }
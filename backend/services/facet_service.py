@@ -0,0 +1,289 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import config
+from services.search_service import SearchService
+
+
+def _popcount(value: int) -> int:
+    return bin(value).count("1")
+
+
+class Bitmap:
+    """Roaring-style bitset.
+
+    Doc ids are split into a 16-bit high key and a 16-bit low part; each high
+    key maps to a Python int holding a 65536-bit container, so sparse sets
+    stay small and AND/OR work a whole container at a time.
+    """
+
+    __slots__ = ("chunks",)
+
+    def __init__(self, chunks: Dict[int, int] = None):
+        self.chunks = chunks if chunks is not None else {}
+
+    @staticmethod
+    def from_iterable(doc_ids: Iterable[int]) -> "Bitmap":
+        buffers: Dict[int, bytearray] = {}
+        for doc_id in doc_ids:
+            high, low = doc_id >> 16, doc_id & 0xFFFF
+            buffer = buffers.get(high)
+            if buffer is None:
+                buffer = buffers[high] = bytearray(8192)
+            buffer[low >> 3] |= 1 << (low & 7)
+        return Bitmap({high: int.from_bytes(buffer, "little") for high, buffer in buffers.items()})
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        chunks = dict(self.chunks)
+        for high, bits in other.chunks.items():
+            chunks[high] = chunks.get(high, 0) | bits
+        return Bitmap(chunks)
+
+    def __sub__(self, other: "Bitmap") -> "Bitmap":
+        chunks = {}
+        for high, bits in self.chunks.items():
+            remaining = bits & ~other.chunks.get(high, 0)
+            if remaining:
+                chunks[high] = remaining
+        return Bitmap(chunks)
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        if len(other.chunks) < len(self.chunks):
+            return other & self
+        chunks = {}
+        for high, bits in self.chunks.items():
+            both = bits & other.chunks.get(high, 0)
+            if both:
+                chunks[high] = both
+        return Bitmap(chunks)
+
+    def __len__(self) -> int:
+        return sum(_popcount(bits) for bits in self.chunks.values())
+
+    def __iter__(self):
+        for high in sorted(self.chunks):
+            bits = self.chunks[high]
+            base = high << 16
+            while bits:
+                lowest = bits & -bits
+                yield base + lowest.bit_length() - 1
+                bits ^= lowest
+
+
+class FacetService:
+    # Catalog columns, indexed by doc id; each product id has one doc,
+    # holding the most recently indexed version of the product
+    doc_ids: Dict[str, int] = {}
+    products: List[dict] = []
+    prices: List[Optional[float]] = []
+    ratings: List[Optional[float]] = []
+    categories: List[Optional[str]] = []
+
+    # Facet value -> bitmap of doc ids
+    price_index: Dict[int, Bitmap] = {}
+    rating_index: Dict[int, Bitmap] = {}
+    category_index: Dict[str, Bitmap] = {}
+
+    # Search cache key -> docs matching that query's text filter, and the
+    # categories those docs had when indexed
+    query_index: Dict[str, Bitmap] = {}
+    query_categories: Dict[str, List[str]] = {}
+
+    @staticmethod
+    def parse_number(value: str) -> Optional[float]:
+        """Parse a display price or rating like '₹1,299' or '4.5'"""
+        try:
+            return float(str(value).replace("₹", "").replace(",", "").strip())
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _bucket_of(value: Optional[float], buckets: list) -> Optional[int]:
+        if value is None:
+            return None
+        for position, (_, low, high) in enumerate(buckets):
+            if value >= low and (high is None or value < high):
+                return position
+        return None
+
+    @staticmethod
+    def _add_to_index(index: dict, groups: Dict):
+        for value, doc_ids in groups.items():
+            bitmap = Bitmap.from_iterable(doc_ids)
+            index[value] = index[value] | bitmap if value in index else bitmap
+
+    @staticmethod
+    def _remove_from_index(index: dict, groups: Dict):
+        for value, doc_ids in groups.items():
+            index[value] = index[value] - Bitmap.from_iterable(doc_ids)
+
+    @staticmethod
+    def index_products(cache_key: str, query: str, products: List[dict], matching: Optional[List[dict]] = None) -> Bitmap:
+        """Add a search result set to the catalog and build its bitmaps
+
+        `matching` are the products that pass the query's text filter, by
+        default those SearchService.search_products finds.
+        """
+        if cache_key in FacetService.query_index:
+            return FacetService.query_index[cache_key]
+
+        if matching is None:
+            matching = SearchService.search_products(products, query)
+        matching = {id(p) for p in matching}
+        # Facet name -> (index, value -> doc ids to add, value -> doc ids to remove)
+        changes = {
+            "price": (FacetService.price_index, {}, {}),
+            "rating": (FacetService.rating_index, {}, {}),
+            "category": (FacetService.category_index, {}, {}),
+        }
+        # Doc id -> facet values before this result set and after it, so a
+        # product listed twice is only moved once
+        before: Dict[int, dict] = {}
+        after: Dict[int, dict] = {}
+        query_docs = []
+        query_categories: Dict[str, None] = {}
+
+        for product in products:
+            price = FacetService.parse_number(product.get("price", ""))
+            rating = FacetService.parse_number(product.get("rating", ""))
+            # Uncategorised (scraped) products stay out of the category facet
+            category = (product.get("category") or "").lower() or None
+            values = {
+                "price": FacetService._bucket_of(price, config.PRICE_BUCKETS),
+                "rating": FacetService._bucket_of(rating, config.RATING_BUCKETS),
+                "category": category,
+            }
+
+            product_id = str(product.get("id"))
+            doc_id = FacetService.doc_ids.get(product_id)
+            if doc_id is None:
+                doc_id = FacetService.doc_ids[product_id] = len(FacetService.products)
+                FacetService.products.append(product)
+                FacetService.prices.append(price)
+                FacetService.ratings.append(rating)
+                FacetService.categories.append(category)
+                before[doc_id] = dict.fromkeys(values)
+            else:
+                # Seen before: keep the latest version of the product
+                if doc_id not in before:
+                    before[doc_id] = {
+                        "price": FacetService._bucket_of(FacetService.prices[doc_id], config.PRICE_BUCKETS),
+                        "rating": FacetService._bucket_of(FacetService.ratings[doc_id], config.RATING_BUCKETS),
+                        "category": FacetService.categories[doc_id],
+                    }
+                FacetService.products[doc_id] = product
+                FacetService.prices[doc_id] = price
+                FacetService.ratings[doc_id] = rating
+                FacetService.categories[doc_id] = category
+            after[doc_id] = values
+
+            if id(product) in matching:
+                query_docs.append(doc_id)
+                if category:
+                    query_categories[category] = None
+
+        # Move docs between buckets only where their values changed
+        for doc_id, values in after.items():
+            previous = before[doc_id]
+            for facet, (_, added, removed) in changes.items():
+                if previous[facet] == values[facet]:
+                    continue
+                if previous[facet] is not None:
+                    removed.setdefault(previous[facet], []).append(doc_id)
+                if values[facet] is not None:
+                    added.setdefault(values[facet], []).append(doc_id)
+
+        for index, added, removed in changes.values():
+            FacetService._remove_from_index(index, removed)
+            FacetService._add_to_index(index, added)
+
+        bitmap = Bitmap.from_iterable(query_docs)
+        FacetService.query_index[cache_key] = bitmap
+        FacetService.query_categories[cache_key] = list(query_categories)
+        return bitmap
+
+    @staticmethod
+    def forget_query(cache_key: str):
+        """Drop a query's bitmap so replaced results are indexed afresh"""
+        FacetService.query_index.pop(cache_key, None)
+        FacetService.query_categories.pop(cache_key, None)
+
+    @staticmethod
+    def _range_filter(index: Dict[int, Bitmap], buckets: list, values: list, low: float, high: float, within: Bitmap) -> Bitmap:
+        """Docs in `within` with low <= value <= high, using whole buckets where possible"""
+        result = Bitmap()
+        for position, (_, bucket_low, bucket_high) in enumerate(buckets):
+            bitmap = index.get(position)
+            if bitmap is None:
+                continue
+            if bucket_low > high or (bucket_high is not None and bucket_high <= low):
+                continue
+            upper_covered = high == float("inf") if bucket_high is None else bucket_high <= high
+            if bucket_low >= low and upper_covered:
+                result = result | bitmap
+            else:
+                # Boundary bucket: only these docs need their exact value checked
+                exact = [doc_id for doc_id in bitmap & within if low <= values[doc_id] <= high]
+                result = result | Bitmap.from_iterable(exact)
+        return result
+
+    @staticmethod
+    def _bucket_counts(index: Dict[int, Bitmap], buckets: list, base: Bitmap) -> List[dict]:
+        counts = []
+        for position, (label, low, high) in enumerate(buckets):
+            bitmap = index.get(position)
+            counts.append({
+                "id": position,
+                "label": label,
+                "min": low,
+                "max": high,
+                "count": len(bitmap & base) if bitmap else 0
+            })
+        return counts
+
+    @staticmethod
+    def facet_search(cache_key: str, min_price: float, max_price: float, min_rating: float = 0, category: str = None) -> Tuple[List[dict], dict]:
+        """Filter a cached query by bitmap intersection and count facet values"""
+        base = FacetService.query_index.get(cache_key, Bitmap())
+
+        filters = {
+            "price": FacetService._range_filter(
+                FacetService.price_index, config.PRICE_BUCKETS, FacetService.prices, min_price, max_price, base
+            )
+        }
+        if min_rating > 0:
+            filters["rating"] = FacetService._range_filter(
+                FacetService.rating_index, config.RATING_BUCKETS, FacetService.ratings, min_rating, float("inf"), base
+            )
+        if category:
+            filters["category"] = FacetService.category_index.get(category.lower(), Bitmap())
+
+        def base_without(facet: str) -> Bitmap:
+            bitmap = base
+            for name, filter_bitmap in filters.items():
+                if name != facet:
+                    bitmap = bitmap & filter_bitmap
+            return bitmap
+
+        # Each facet is counted against every filter except its own, so the
+        # UI can show what selecting another value of that facet would give.
+        facets = {
+            "price": FacetService._bucket_counts(
+                FacetService.price_index, config.PRICE_BUCKETS, base_without("price")
+            ),
+            "rating": FacetService._bucket_counts(
+                FacetService.rating_index, config.RATING_BUCKETS, base_without("rating")
+            ),
+        }
+
+        # Only the query's own categories are intersected, so the cost
+        # doesn't grow with the categories across all cached searches
+        category_base = base_without("category")
+        facets["category"] = []
+        for name in FacetService.query_categories.get(cache_key, ()):
+            count = len(FacetService.category_index.get(name, Bitmap()) & category_base)
+            if count:
+                facets["category"].append({"id": name, "label": name.title(), "count": count})
+
+        matched = base_without(None)
+        products = [FacetService.products[doc_id] for doc_id in matched]
+        return products, facets
@@ -0,0 +1,267 @@
+import asyncio
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import requests
+
+import config
+
+try:
+    from PIL import Image
+except ImportError:  # resizing is skipped and originals are served as-is
+    Image = None
+
+
+def _resize_image(data: bytes, width: int, quality: int) -> Tuple[bytes, str]:
+    """Resize and recompress an image (runs in a worker process)"""
+    if Image is None:
+        return data, ""
+
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        if width and img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.LANCZOS)
+
+        output = io.BytesIO()
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        if has_alpha:
+            img.save(output, format="PNG", optimize=True)
+            return output.getvalue(), "image/png"
+
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.save(output, format="JPEG", quality=quality, optimize=True, progressive=True)
+        return output.getvalue(), "image/jpeg"
+
+
+def _sniff_content_type(data: bytes) -> str:
+    """Guess an image content type from its magic bytes"""
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return "application/octet-stream"
+
+
+class ImageService:
+    image_urls: Dict[str, str] = {}
+    # digest -> size in bytes, least recently used first
+    _lru: "OrderedDict[str, int]" = OrderedDict()
+    _cache_bytes = 0
+    _cache_loaded = False
+    _lock = threading.Lock()
+    _inflight: Dict[str, asyncio.Task] = {}
+    _pool: Optional[ProcessPoolExecutor] = None
+
+    @staticmethod
+    def image_key(url: str) -> str:
+        """Stable proxy key for an origin image URL"""
+        return hashlib.sha256(url.encode()).hexdigest()[:32]
+
+    @staticmethod
+    def register_image(url: str) -> str:
+        """Allow an origin URL to be served through the proxy"""
+        key = ImageService.image_key(url)
+        ImageService.image_urls[key] = url
+        return key
+
+    @staticmethod
+    def proxy_url(url: str, base_url: str, width: int = 300) -> str:
+        """Build the proxied URL for an origin image"""
+        if not url or not url.startswith(("http://", "https://")):
+            return url
+        key = ImageService.register_image(url)
+        return f"{base_url.rstrip('/')}/api/img/{key}?w={width}"
+
+    @staticmethod
+    def rewrite_products(products: list, base_url: str, width: int = 300) -> list:
+        """Return copies of products with image_url pointing at the proxy"""
+        if not config.IMAGE_PROXY_ENABLED:
+            return products
+        return [
+            {**product, "image_url": ImageService.proxy_url(product.get("image_url", ""), base_url, width)}
+            for product in products
+        ]
+
+    @staticmethod
+    def snap_width(width: int) -> int:
+        """Round a requested width up to one of the configured variants"""
+        if not width or width <= 0:
+            return 0
+        for allowed in config.IMAGE_WIDTHS:
+            if width <= allowed:
+                return allowed
+        return config.IMAGE_WIDTHS[-1]
+
+    @staticmethod
+    def _object_path(digest: str) -> str:
+        return os.path.join(config.IMAGE_CACHE_DIR, "objects", digest[:2], digest)
+
+    @staticmethod
+    def _ref_path(key: str, width: int) -> str:
+        return os.path.join(config.IMAGE_CACHE_DIR, "refs", f"{key}_{width}")
+
+    @staticmethod
+    def _url_path(key: str) -> str:
+        return os.path.join(config.IMAGE_CACHE_DIR, "refs", f"{key}.url")
+
+    @staticmethod
+    def _load_cache_index():
+        """Rebuild the LRU index from files already on disk"""
+        objects_dir = os.path.join(config.IMAGE_CACHE_DIR, "objects")
+        entries = []
+        for root, _, files in os.walk(objects_dir):
+            for name in files:
+                stat = os.stat(os.path.join(root, name))
+                entries.append((stat.st_mtime, name, stat.st_size))
+
+        entries.sort()
+        ImageService._lru = OrderedDict((name, size) for _, name, size in entries)
+        ImageService._cache_bytes = sum(size for _, _, size in entries)
+        ImageService._cache_loaded = True
+
+    @staticmethod
+    def _write_file(path: str, data: bytes):
+        """Write atomically so readers never see a partial file"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_cached(key: str, width: int) -> Optional[Tuple[bytes, str, str]]:
+        """Return (data, content_type, digest) if the variant is on disk"""
+        with ImageService._lock:
+            if not ImageService._cache_loaded:
+                ImageService._load_cache_index()
+        try:
+            with open(ImageService._ref_path(key, width)) as f:
+                digest, content_type = f.read().split()
+            path = ImageService._object_path(digest)
+            with open(path, "rb") as f:
+                data = f.read()
+        except (OSError, ValueError):
+            return None
+
+        os.utime(path)
+        with ImageService._lock:
+            if digest in ImageService._lru:
+                ImageService._lru.move_to_end(digest)
+        return data, content_type, digest
+
+    @staticmethod
+    def _store(key: str, width: int, url: str, data: bytes, content_type: str) -> str:
+        """Store a variant under its content hash and evict down to the size budget"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = ImageService._object_path(digest)
+        with ImageService._lock:
+            if digest not in ImageService._lru:
+                ImageService._write_file(path, data)
+                ImageService._lru[digest] = len(data)
+                ImageService._cache_bytes += len(data)
+            ImageService._lru.move_to_end(digest)
+            ImageService._write_file(ImageService._ref_path(key, width), f"{digest} {content_type}".encode())
+            ImageService._write_file(ImageService._url_path(key), url.encode())
+
+            while ImageService._cache_bytes > config.IMAGE_CACHE_MAX_BYTES and len(ImageService._lru) > 1:
+                old_digest, size = ImageService._lru.popitem(last=False)
+                ImageService._cache_bytes -= size
+                try:
+                    os.remove(ImageService._object_path(old_digest))
+                except OSError:
+                    pass
+
+        return digest
+
+    @staticmethod
+    def _lookup_url(key: str) -> Optional[str]:
+        """Find the origin URL for a key, including ones fetched before a restart"""
+        url = ImageService.image_urls.get(key)
+        if url:
+            return url
+        try:
+            with open(ImageService._url_path(key)) as f:
+                url = f.read().strip()
+        except OSError:
+            return None
+        ImageService.image_urls[key] = url
+        return url
+
+    @staticmethod
+    def fetch_origin(url: str) -> bytes:
+        """Download the original image"""
+        response = requests.get(url, timeout=config.SCRAPE_TIMEOUT, stream=True)
+        response.raise_for_status()
+        data = response.raw.read(config.IMAGE_MAX_ORIGIN_BYTES + 1, decode_content=True)
+        if len(data) > config.IMAGE_MAX_ORIGIN_BYTES:
+            raise ValueError("Origin image too large")
+        return data
+
+    @staticmethod
+    def _get_pool() -> ProcessPoolExecutor:
+        if ImageService._pool is None:
+            ImageService._pool = ProcessPoolExecutor(max_workers=config.IMAGE_WORKERS)
+        return ImageService._pool
+
+    @staticmethod
+    async def _produce(key: str, width: int, url: str) -> Tuple[bytes, str, str]:
+        """Fetch, resize and cache one variant"""
+        loop = asyncio.get_running_loop()
+        try:
+            data = await loop.run_in_executor(None, ImageService.fetch_origin, url)
+            content_type = ""
+            if width and Image is not None:
+                try:
+                    data, content_type = await loop.run_in_executor(
+                        ImageService._get_pool(), _resize_image, data, width, config.IMAGE_QUALITY
+                    )
+                except OSError:
+                    # Pillow can't decode it (UnidentifiedImageError is an
+                    # OSError); served as is below if it's a format we know
+                    pass
+                except Image.DecompressionBombError:
+                    raise ValueError("Origin image is too large to resize")
+            if not content_type:
+                content_type = _sniff_content_type(data)
+                # Whatever is stored here is served as immutable, so never
+                # let something like an HTML error page in
+                if content_type == "application/octet-stream":
+                    raise ValueError("Origin did not return an image")
+            digest = await loop.run_in_executor(None, ImageService._store, key, width, url, data, content_type)
+            return data, content_type, digest
+        finally:
+            ImageService._inflight.pop(f"{key}_{width}", None)
+
+    @staticmethod
+    async def get_image(key: str, width: int = 0) -> Tuple[bytes, str, str]:
+        """Get (data, content_type, digest) for a proxied image variant"""
+        if not re.fullmatch(r"[0-9a-f]{32}", key):
+            raise KeyError("Unknown image")
+        width = ImageService.snap_width(width)
+        url = ImageService._lookup_url(key)
+        if not url:
+            raise KeyError("Unknown image")
+
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, ImageService._read_cached, key, width)
+        if cached:
+            return cached
+
+        variant = f"{key}_{width}"
+        task = ImageService._inflight.get(variant)
+        if task is None:
+            task = asyncio.ensure_future(ImageService._produce(key, width, url))
+            ImageService._inflight[variant] = task
+        return await asyncio.shield(task)
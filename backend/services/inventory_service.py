@@ -0,0 +1,189 @@
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import config
+
+
+class StockShard:
+    __slots__ = ("lock", "available", "sold")
+
+    def __init__(self, available: int):
+        self.lock = threading.Lock()
+        self.available = available
+        self.sold = 0
+
+
+class Reservation:
+    __slots__ = ("id", "takes", "expires_at")
+
+    def __init__(self, reservation_id: str, takes: List[Tuple[StockShard, int]], expires_at: float):
+        self.id = reservation_id
+        # (shard, quantity) pairs; a reservation may span shards and SKUs
+        self.takes = takes
+        self.expires_at = expires_at
+
+
+class InventoryService:
+    """Sharded stock counters with reserve / commit / release.
+
+    Each SKU's stock is split across INVENTORY_SHARDS counters with their
+    own locks, so concurrent checkouts of a hot SKU mostly contend on
+    different locks. A shard never goes below zero, which is what rules
+    out overselling. Reservations hold stock until committed (payment
+    succeeded), released (payment failed) or their TTL runs out.
+    """
+
+    stock: Dict[str, List[StockShard]] = {}
+    reservations: Dict[str, Reservation] = {}
+    # Expiry heaps are sharded like stock so reserving never takes a global lock
+    _expiry_heaps: List[Tuple[threading.Lock, List[Tuple[float, str]]]] = [
+        (threading.Lock(), []) for _ in range(config.INVENTORY_SHARDS)
+    ]
+    _registry_lock = threading.Lock()
+    # Rotate the starting shard and expiry heap per call (next() on a
+    # count is atomic under the GIL). Thread idents can't be used: they
+    # are aligned addresses, and the server reserves from one loop thread.
+    _shard_cursor = itertools.count()
+    _heap_cursor = itertools.count()
+    _last_sweep = 0.0
+
+    @staticmethod
+    def _split(quantity: int) -> List[int]:
+        """Spread a quantity evenly over the configured number of shards"""
+        count = config.INVENTORY_SHARDS
+        return [quantity // count + (1 if i < quantity % count else 0) for i in range(count)]
+
+    @staticmethod
+    def _shards(sku: str) -> List[StockShard]:
+        shards = InventoryService.stock.get(sku)
+        if shards is None:
+            with InventoryService._registry_lock:
+                shards = InventoryService.stock.get(sku)
+                if shards is None:
+                    shards = [StockShard(quantity) for quantity in InventoryService._split(config.DEFAULT_STOCK)]
+                    InventoryService.stock[sku] = shards
+        return shards
+
+    @staticmethod
+    def set_stock(sku: str, quantity: int):
+        """Set available stock for a SKU; outstanding reservations are unaffected"""
+        for shard, share in zip(InventoryService._shards(sku), InventoryService._split(quantity)):
+            with shard.lock:
+                shard.available = share
+
+    @staticmethod
+    def _take(sku: str, quantity: int) -> Optional[List[Tuple[StockShard, int]]]:
+        """Take stock from shards, starting at a rotating one; None if short"""
+        shards = InventoryService._shards(sku)
+        start = next(InventoryService._shard_cursor) % len(shards)
+        takes = []
+        needed = quantity
+        for offset in range(len(shards)):
+            shard = shards[(start + offset) % len(shards)]
+            if not shard.available:
+                continue
+            with shard.lock:
+                taken = min(shard.available, needed)
+                shard.available -= taken
+            if taken:
+                takes.append((shard, taken))
+                needed -= taken
+                if not needed:
+                    return takes
+
+        InventoryService._give_back(takes)
+        return None
+
+    @staticmethod
+    def _give_back(takes: List[Tuple[StockShard, int]]):
+        for shard, quantity in takes:
+            with shard.lock:
+                shard.available += quantity
+
+    @staticmethod
+    def reserve(quantities: Dict[str, int], ttl: float = None) -> str:
+        """Atomically reserve stock for several SKUs; raises ValueError if any is short"""
+        InventoryService.release_expired()
+
+        takes = []
+        for sku, quantity in quantities.items():
+            if quantity <= 0:
+                continue
+            taken = InventoryService._take(sku, quantity)
+            if taken is None:
+                InventoryService._give_back(takes)
+                raise ValueError(f"Insufficient stock for product {sku}")
+            takes.extend(taken)
+
+        reservation_id = uuid.uuid4().hex[:16]
+        expires_at = time.monotonic() + (config.RESERVATION_TTL_SECONDS if ttl is None else ttl)
+        InventoryService.reservations[reservation_id] = Reservation(reservation_id, takes, expires_at)
+        heaps = InventoryService._expiry_heaps
+        lock, heap = heaps[next(InventoryService._heap_cursor) % len(heaps)]
+        with lock:
+            heapq.heappush(heap, (expires_at, reservation_id))
+        return reservation_id
+
+    @staticmethod
+    def commit(reservation_id: str) -> bool:
+        """Turn a reservation into a sale; False if it already expired or was released"""
+        # dict.pop is atomic, so exactly one of commit/release/expiry wins
+        reservation = InventoryService.reservations.pop(reservation_id, None)
+        if reservation is None:
+            return False
+        for shard, quantity in reservation.takes:
+            with shard.lock:
+                shard.sold += quantity
+        return True
+
+    @staticmethod
+    def release(reservation_id: str) -> bool:
+        """Return reserved stock; False if the reservation is no longer held"""
+        reservation = InventoryService.reservations.pop(reservation_id, None)
+        if reservation is None:
+            return False
+        InventoryService._give_back(reservation.takes)
+        return True
+
+    @staticmethod
+    def is_active(reservation_id: Optional[str]) -> bool:
+        """Whether a reservation still holds its stock"""
+        reservation = InventoryService.reservations.get(reservation_id) if reservation_id else None
+        return reservation is not None and reservation.expires_at > time.monotonic()
+
+    @staticmethod
+    def release_expired(now: float = None) -> int:
+        """Release reservations past their TTL (runs at most once a second unless forced)"""
+        if now is None:
+            now = time.monotonic()
+            if now - InventoryService._last_sweep < 1:
+                return 0
+        InventoryService._last_sweep = now
+
+        released = 0
+        for lock, heap in InventoryService._expiry_heaps:
+            expired = []
+            with lock:
+                while heap and heap[0][0] <= now:
+                    expired.append(heapq.heappop(heap)[1])
+            for reservation_id in expired:
+                if InventoryService.release(reservation_id):
+                    released += 1
+        return released
+
+    @staticmethod
+    def get_stock(sku: str) -> dict:
+        """Available and sold counts for a SKU"""
+        # Abandoned checkouts must not hold stock out of "available" until
+        # the next reservation happens to sweep them
+        InventoryService.release_expired()
+        shards = InventoryService._shards(sku)
+        return {
+            "product_id": sku,
+            "available": sum(shard.available for shard in shards),
+            "sold": sum(shard.sold for shard in shards)
+        }
@@ -1,60 +1,98 @@
 import uuid
-from datetime import datetime
-from typing import Dict
+from typing import Callable, Dict, List
 import random
+from services.records import CartLine, OrderRecord, TransactionRecord, now_epoch
+from services.inventory_service import InventoryService
 
 class PaymentService:
-    orders_db: Dict[str, dict] = {}
-    transactions_db: Dict[str, dict] = {}
+    # Orders and transactions are stored as compact records and only turned
+    # into the API's dict shape when returned or emitted
+    orders_db: Dict[str, OrderRecord] = {}
+    transactions_db: Dict[str, TransactionRecord] = {}
+    listeners: List[Callable[[str, dict], None]] = []
+
+    @staticmethod
+    def subscribe(listener: Callable[[str, dict], None]):
+        """Register a callback for order and payment events"""
+        PaymentService.listeners.append(listener)
+
+    @staticmethod
+    def _emit(event: str, payload: dict):
+        """Notify listeners; a failing listener never breaks checkout"""
+        for listener in PaymentService.listeners:
+            try:
+                listener(event, payload)
+            except Exception as e:
+                print(f"Payment listener error ({event}): {e}")
+
+    @staticmethod
+    def _reserve_stock(order: OrderRecord):
+        """Reserve stock for an order's items; raises ValueError if any is short"""
+        quantities = {}
+        for item in order.items:
+            if isinstance(item, CartLine):
+                product_id, quantity = item.product.product_id, item.quantity
+            elif isinstance(item, dict) and item.get("product_id") not in (None, ""):
+                # Items kept as given because they don't have the exact cart line shape
+                product_id, quantity = str(item["product_id"]), item.get("quantity", 1)
+            else:
+                continue
+            quantities[product_id] = quantities.get(product_id, 0) + int(quantity)
+        return InventoryService.reserve(quantities) if quantities else None
 
     @staticmethod
     def create_order(user_id: str, user_email: str, items: list, total_price: float, delivery_address: str) -> dict:
         """Create new order"""
         order_id = str(uuid.uuid4())[:12]
         
-        order = {
-            "id": order_id,
-            "user_id": user_id,
-            "user_email": user_email,
-            "items": items,
-            "total_price": total_price,
-            "payment_status": "pending",
-            "order_status": "pending",
-            "delivery_address": delivery_address,
-            "created_at": datetime.now().isoformat(),
-            "updated_at": datetime.now().isoformat()
-        }
+        order = OrderRecord(order_id, user_id, user_email, items, total_price, delivery_address, now_epoch())
+        order.reservation_id = PaymentService._reserve_stock(order)
         
         PaymentService.orders_db[order_id] = order
-        return order
+        order_dict = order.to_dict()
+        PaymentService._emit("order.created", {"order": order_dict})
+        return order_dict
 
     @staticmethod
     def process_payment(order_id: str, amount: float, payment_method: str, user_id: str) -> dict:
         """Process payment (simulated)"""
         if order_id not in PaymentService.orders_db:
             raise ValueError("Order not found")
+
+        # Stock held at order creation may have been released by a failed
+        # attempt or its TTL; take it again before charging
+        order = PaymentService.orders_db[order_id]
+        if order.payment_status != "completed" and not InventoryService.is_active(order.reservation_id):
+            if order.reservation_id:
+                InventoryService.release(order.reservation_id)
+            order.reservation_id = PaymentService._reserve_stock(order)
         
         # Simulate payment processing
         success = random.choice([True, True, True, False])  # 75% success rate for demo
         transaction_id = str(uuid.uuid4())[:16]
         
-        transaction = {
-            "id": transaction_id,
-            "order_id": order_id,
-            "amount": amount,
-            "payment_method": payment_method,
-            "user_id": user_id,
-            "status": "success" if success else "failed",
-            "timestamp": datetime.now().isoformat()
-        }
+        transaction = TransactionRecord(
+            transaction_id, order_id, amount, payment_method, user_id,
+            "success" if success else "failed", now_epoch()
+        )
         
         PaymentService.transactions_db[transaction_id] = transaction
+        previous_payment_status = order.payment_status
         
         if success:
-            order = PaymentService.orders_db[order_id]
-            order["payment_status"] = "completed"
-            order["order_status"] = "confirmed"
-            order["updated_at"] = datetime.now().isoformat()
+            order.payment_status = "completed"
+            order.order_status = "confirmed"
+            order.updated_at = transaction.timestamp
+            if order.reservation_id:
+                InventoryService.commit(order.reservation_id)
+        elif order.reservation_id and order.payment_status != "completed":
+            InventoryService.release(order.reservation_id)
+
+        PaymentService._emit("payment.processed", {
+            "order": order.to_dict(),
+            "transaction": transaction.to_dict(),
+            "previous_payment_status": previous_payment_status
+        })
         
         return {
             "success": success,
@@ -69,16 +107,16 @@ class PaymentService:
         """Get order details"""
         if order_id not in PaymentService.orders_db:
             raise ValueError("Order not found")
-        return PaymentService.orders_db[order_id]
+        return PaymentService.orders_db[order_id].to_dict()
 
     @staticmethod
     def get_user_orders(user_id: str) -> list:
         """Get all user orders"""
-        return [order for order in PaymentService.orders_db.values() if order["user_id"] == user_id]
+        return [order.to_dict() for order in PaymentService.orders_db.values() if order.user_id == user_id]
 
     @staticmethod
     def get_transaction(transaction_id: str) -> dict:
         """Get transaction details"""
         if transaction_id not in PaymentService.transactions_db:
             raise ValueError("Transaction not found")
-        return PaymentService.transactions_db[transaction_id]
+        return PaymentService.transactions_db[transaction_id].to_dict()
@@ -0,0 +1,176 @@
+import asyncio
+import re
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from bs4 import BeautifulSoup
+
+import config
+
+
+class ProductDetailService:
+    # Detail pages are cached separately from search results so that a
+    # search refresh never evicts enriched product data (and vice versa).
+    details_cache: "OrderedDict[str, dict]" = OrderedDict()
+    product_urls: Dict[str, str] = {}
+    _inflight: Dict[str, asyncio.Task] = {}
+    _semaphore: Optional[asyncio.Semaphore] = None
+
+    DEFAULT_SPECIFICATIONS = {
+        "warranty": "1 year manufacturer warranty",
+        "return_policy": "30 days return",
+        "delivery": "Free delivery across India",
+        "seller": "Authorized Seller",
+        "cod_available": True
+    }
+
+    DEFAULT_OFFERS = [
+        {"text": "₹3,315 off with Credit Card", "code": "CARD3K"},
+        {"text": "₹1,000 off with Debit Card", "code": "DB1000"}
+    ]
+
+    @staticmethod
+    def register_product_url(product_id: str, product_url: str):
+        """Remember where a scraped product's detail page lives"""
+        if not product_url:
+            return
+        if product_url.startswith("/"):
+            product_url = f"{config.FLIPKART_BASE_URL}{product_url}"
+        ProductDetailService.product_urls[str(product_id)] = product_url
+
+    @staticmethod
+    def parse_product_page(html: bytes) -> dict:
+        """Extract specifications, offers and description from a product page"""
+        soup = BeautifulSoup(html, 'html.parser')
+
+        specifications = {}
+        for row in soup.find_all('tr'):
+            cells = row.find_all('td')
+            if len(cells) < 2:
+                continue
+            key = cells[0].get_text(" ", strip=True)
+            value = cells[1].get_text(" ", strip=True)
+            if key and value and len(specifications) < 30:
+                specifications[key] = value
+
+        offers = []
+        for item in soup.find_all('li'):
+            text = item.get_text(" ", strip=True)
+            if re.search(r'offer|off\b|cashback', text, re.IGNORECASE) and len(offers) < 10:
+                offers.append({"text": text[:200], "code": None})
+
+        description = None
+        meta = soup.find('meta', attrs={'name': 'description'})
+        if meta and meta.get('content'):
+            description = meta['content'].strip()
+
+        return {
+            "specifications": specifications,
+            "offers": offers,
+            "description": description
+        }
+
+    @staticmethod
+    def _default_entry(product: dict) -> dict:
+        """Detail entry used when no product page is available"""
+        return {
+            "product": product,
+            "specifications": dict(ProductDetailService.DEFAULT_SPECIFICATIONS),
+            "offers": list(ProductDetailService.DEFAULT_OFFERS),
+            "source": "default",
+            "fetched_at": datetime.now().isoformat()
+        }
+
+    @staticmethod
+    def _store(product_id: str, entry: dict):
+        """Insert into the LRU details cache"""
+        cache = ProductDetailService.details_cache
+        cache[product_id] = entry
+        cache.move_to_end(product_id)
+        while len(cache) > config.DETAIL_CACHE_MAX_SIZE:
+            cache.popitem(last=False)
+
+    @staticmethod
+    def _fetch_page(url: str, headers: dict) -> bytes:
+        """Blocking page download, run in a worker thread"""
+        response = requests.get(url, headers=headers, timeout=config.SCRAPE_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+
+    @staticmethod
+    async def _fetch_and_store(product: dict, url: str, headers: dict) -> dict:
+        """Fetch and parse one product page under the shared concurrency limit"""
+        if ProductDetailService._semaphore is None:
+            ProductDetailService._semaphore = asyncio.Semaphore(config.DETAIL_FETCH_CONCURRENCY)
+
+        product_id = str(product["id"])
+        loop = asyncio.get_running_loop()
+        try:
+            async with ProductDetailService._semaphore:
+                html = await loop.run_in_executor(None, ProductDetailService._fetch_page, url, headers)
+            parsed = await loop.run_in_executor(None, ProductDetailService.parse_product_page, html)
+        except Exception as e:
+            # Not cached, so the next request retries the page
+            print(f"Detail fetch error for {product_id}: {e}")
+            return ProductDetailService._default_entry(product)
+        else:
+            entry = ProductDetailService._default_entry(product)
+            if parsed["specifications"]:
+                entry["specifications"] = parsed["specifications"]
+            if parsed["offers"]:
+                entry["offers"] = parsed["offers"]
+            if parsed["description"]:
+                entry["product"] = {**product, "description": parsed["description"]}
+            entry["source"] = "scraped"
+        finally:
+            ProductDetailService._inflight.pop(product_id, None)
+
+        ProductDetailService._store(product_id, entry)
+        return entry
+
+    @staticmethod
+    async def get_details(product: dict, headers: dict, timeout: float = None) -> dict:
+        """Get enriched details for a product, fetching its page if needed"""
+        product_id = str(product["id"])
+        cache = ProductDetailService.details_cache
+        if product_id in cache:
+            cache.move_to_end(product_id)
+            return cache[product_id]
+
+        url = ProductDetailService.product_urls.get(product_id)
+        if not url:
+            # Cheap to rebuild, and the url may be registered later
+            return ProductDetailService._default_entry(product)
+
+        # Concurrent callers for the same product share one fetch. The task is
+        # shielded so a caller timing out still lets it finish and fill the cache.
+        task = ProductDetailService._inflight.get(product_id)
+        if task is None:
+            task = asyncio.ensure_future(ProductDetailService._fetch_and_store(product, url, headers))
+            ProductDetailService._inflight[product_id] = task
+
+        if timeout is None:
+            timeout = config.DETAIL_FETCH_TIMEOUT
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+    @staticmethod
+    async def get_many(products: List[dict], headers: dict, timeout: float = None) -> Tuple[List[dict], Dict[str, str]]:
+        """Resolve many products concurrently, returning entries and per-item errors"""
+        results = await asyncio.gather(
+            *(ProductDetailService.get_details(product, headers, timeout) for product in products),
+            return_exceptions=True
+        )
+
+        entries = []
+        errors = {}
+        for product, result in zip(products, results):
+            if isinstance(result, asyncio.TimeoutError):
+                errors[str(product["id"])] = "timeout"
+            elif isinstance(result, Exception):
+                errors[str(product["id"])] = str(result) or result.__class__.__name__
+            else:
+                entries.append(result)
+
+        return entries, errors
@@ -0,0 +1,206 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter, OrderedDict, deque
+from datetime import datetime
+from typing import Optional
+
+import config
+
+
+def _folded_stack(frame) -> str:
+    """Render a frame chain root-first as 'func (file:line);...' for flame graphs"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class LoopLagMonitor:
+    """Measures event loop scheduling delay with a periodic sleeping task"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.samples = 0
+        self.recent = deque(maxlen=600)
+        self._task: Optional[asyncio.Task] = None
+
+    def ensure_started(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = (time.perf_counter() - start - self.interval) * 1000
+            self.samples += 1
+            self.recent.append(lag)
+            self.max_lag_ms = max(self.max_lag_ms, lag)
+            # Decay slowly so one spike is visible for a few samples, but
+            # jump immediately when the loop gets worse.
+            self.lag_ms = max(lag, self.lag_ms * 0.5)
+
+    def stats(self) -> dict:
+        recent = sorted(self.recent)
+        return {
+            "current_ms": round(self.lag_ms, 2),
+            "max_ms": round(self.max_lag_ms, 2),
+            "p50_ms": round(recent[len(recent) // 2], 2) if recent else None,
+            "p99_ms": round(recent[int(len(recent) * 0.99)], 2) if recent else None,
+            "samples": self.samples
+        }
+
+
+class BlockingCallDetector:
+    """Watchdog thread that dumps the loop thread's stack when the loop stalls.
+
+    A task on the loop refreshes a heartbeat; if the watchdog sees it go
+    stale for longer than the threshold, whatever the loop thread is
+    executing right now is the blocking callback.
+    """
+
+    def __init__(self, threshold_ms: float):
+        self.threshold = threshold_ms / 1000
+        self.events = deque(maxlen=20)
+        self._heartbeat = time.perf_counter()
+        self._reported = None
+        self._loop_thread_id = None
+        self._stop = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._heartbeat = time.perf_counter()
+        self._task = asyncio.ensure_future(self._beat())
+        self._thread = threading.Thread(target=self._watch, name="blocking-call-detector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _beat(self):
+        while True:
+            self._heartbeat = time.perf_counter()
+            await asyncio.sleep(self.threshold / 4)
+
+    def _watch(self):
+        while not self._stop.wait(self.threshold / 4):
+            heartbeat = self._heartbeat
+            stalled = time.perf_counter() - heartbeat - self.threshold / 4
+            if stalled < self.threshold or heartbeat == self._reported:
+                continue
+            self._reported = heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            self.events.append({
+                "detected_at": datetime.now().isoformat(),
+                "blocked_ms": round(stalled * 1000, 1),
+                "stack": stack
+            })
+            print(f"Event loop blocked for {stalled * 1000:.0f}ms in:\n{stack}")
+
+
+class StackSampler:
+    """Samples one thread's stack at a fixed interval into folded-stack counts"""
+
+    def __init__(self, thread_id: int, interval_ms: float):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> str:
+        """Stop sampling (idempotent) and return folded stacks, one 'stack count' per line"""
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join()
+        return "\n".join(f"{stack} {count}" for stack, count in self.counts.most_common())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.counts[_folded_stack(frame)] += 1
+
+
+class ProfilingService:
+    enabled = config.PROFILING_ENABLED
+    lag_monitor = LoopLagMonitor(config.LOOP_LAG_SAMPLE_INTERVAL)
+    detector: Optional[BlockingCallDetector] = None
+    # profile id -> folded stacks, oldest evicted first
+    profiles: "OrderedDict[str, dict]" = OrderedDict()
+
+    @staticmethod
+    def set_enabled(enabled: bool, blocking_threshold_ms: float = None):
+        """Turn instrumentation on or off (must be called on the event loop)"""
+        if ProfilingService.detector is not None:
+            ProfilingService.detector.stop()
+            ProfilingService.detector = None
+
+        ProfilingService.enabled = enabled
+        if enabled:
+            threshold = blocking_threshold_ms or config.BLOCKING_THRESHOLD_MS
+            ProfilingService.detector = BlockingCallDetector(threshold)
+            ProfilingService.detector.start()
+
+    @staticmethod
+    def ensure_started():
+        """Start background monitors on first use from the event loop"""
+        ProfilingService.lag_monitor.ensure_started()
+        if ProfilingService.enabled and ProfilingService.detector is None:
+            ProfilingService.set_enabled(True)
+
+    @staticmethod
+    def start_profile() -> StackSampler:
+        """Begin sampling the event loop thread"""
+        sampler = StackSampler(threading.get_ident(), config.PROFILE_SAMPLE_INTERVAL_MS)
+        sampler.start()
+        return sampler
+
+    @staticmethod
+    def finish_profile(sampler: StackSampler, path: str, elapsed_ms: float) -> str:
+        """Stop a sampler and store its folded stacks; returns the profile id"""
+        profile_id = uuid.uuid4().hex[:12]
+        ProfilingService.profiles[profile_id] = {
+            "id": profile_id,
+            "path": path,
+            "elapsed_ms": round(elapsed_ms, 2),
+            "created_at": datetime.now().isoformat(),
+            "folded": sampler.stop()
+        }
+        while len(ProfilingService.profiles) > config.MAX_STORED_PROFILES:
+            ProfilingService.profiles.popitem(last=False)
+        return profile_id
+
+    @staticmethod
+    def status() -> dict:
+        detector = ProfilingService.detector
+        return {
+            "enabled": ProfilingService.enabled,
+            "loop_lag": ProfilingService.lag_monitor.stats(),
+            "blocking_threshold_ms": detector.threshold * 1000 if detector else None,
+            "blocking_events": list(detector.events) if detector else [],
+            "profiles": [
+                {key: value for key, value in profile.items() if key != "folded"}
+                for profile in ProfilingService.profiles.values()
+            ]
+        }
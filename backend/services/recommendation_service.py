@@ -0,0 +1,174 @@
+from bisect import insort
+from typing import Dict, List, Tuple
+
+import config
+
+MAX_ITEMS_PER_ORDER = 50
+
+
+class RecommendationService:
+    # Sparse co-occurrence matrix: product -> {other product -> times bought together}
+    co_counts: Dict[str, Dict[str, int]] = {}
+    # Per product, the best neighbours as (-count, other) kept sorted
+    top_items: Dict[str, List[Tuple[int, str]]] = {}
+    product_names: Dict[str, str] = {}
+    pair_count = 0
+    # Count -> number of pairs with that count, to pick what a sweep drops
+    count_histogram: Dict[int, int] = {}
+    # Rows still to visit in the current pruning sweep; pairs below the
+    # sweep's threshold count are dropped, and up to _prune_ties pairs at it
+    _prune_pending: List[str] = []
+    _prune_threshold = 0
+    _prune_ties = 0
+    orders_seen = 0
+
+    @staticmethod
+    def _order_products(items: list) -> List[str]:
+        """Distinct product ids in an order, remembering their names"""
+        product_ids = []
+        for item in items[:MAX_ITEMS_PER_ORDER]:
+            if isinstance(item, dict):
+                product_id = str(item.get("product_id", ""))
+                name = item.get("product_name")
+            else:
+                product_id, name = str(item), None
+            if not product_id:
+                continue
+            if name:
+                RecommendationService.product_names[product_id] = name
+            product_ids.append(product_id)
+        return list(dict.fromkeys(product_ids))
+
+    @staticmethod
+    def _update_top(product_id: str, other: str, count: int):
+        """Keep the top-k list of one product in sync with a new count"""
+        top = RecommendationService.top_items.setdefault(product_id, [])
+        for position, (_, neighbour) in enumerate(top):
+            if neighbour == other:
+                del top[position]
+                break
+        else:
+            if len(top) >= config.RECOMMENDATION_TOP_K:
+                if count <= -top[-1][0]:
+                    return
+                top.pop()
+        insort(top, (-count, other))
+
+    @staticmethod
+    def _count_changed(old: int, new: int):
+        histogram = RecommendationService.count_histogram
+        if old:
+            histogram[old] -= 1
+            if not histogram[old]:
+                del histogram[old]
+        if new:
+            histogram[new] = histogram.get(new, 0) + 1
+
+    @staticmethod
+    def _trim_row(product_id: str):
+        """Drop the weakest quarter of a row that outgrew its neighbour budget"""
+        row = RecommendationService.co_counts[product_id]
+        keep = {other for _, other in RecommendationService.top_items.get(product_id, [])}
+        candidates = sorted((count, other) for other, count in row.items() if other not in keep)
+        for count, other in candidates[:max(1, len(row) // 4)]:
+            del row[other]
+            RecommendationService._count_changed(count, 0)
+            RecommendationService.pair_count -= 1
+
+    @staticmethod
+    def _start_sweep():
+        """Pick the lowest counts that bring the matrix down to the prune target"""
+        excess = RecommendationService.pair_count - config.RECOMMENDATION_PRUNE_TARGET
+        below = 0
+        for count in sorted(RecommendationService.count_histogram):
+            pairs = RecommendationService.count_histogram[count]
+            if below + pairs >= excess:
+                RecommendationService._prune_threshold = count
+                RecommendationService._prune_ties = excess - below
+                break
+            below += pairs
+        RecommendationService._prune_pending.extend(RecommendationService.co_counts)
+
+    @staticmethod
+    def _prune_step(batch: int):
+        """Drop the lowest-count pairs from the next `batch` rows.
+
+        Pruning runs on the checkout path, so one sweep over the matrix is
+        spread across orders, and it stops once the matrix is back down to
+        RECOMMENDATION_PRUNE_TARGET pairs.
+        """
+        pending = RecommendationService._prune_pending
+        if not pending:
+            RecommendationService._start_sweep()
+        threshold = RecommendationService._prune_threshold
+        for _ in range(min(batch, len(pending))):
+            if RecommendationService.pair_count <= config.RECOMMENDATION_PRUNE_TARGET:
+                pending.clear()
+                return
+            product_id = pending.pop()
+            row = RecommendationService.co_counts.get(product_id)
+            if row is None:
+                continue
+            weak = []
+            for other, count in row.items():
+                if count < threshold:
+                    weak.append(other)
+                elif count == threshold and RecommendationService._prune_ties > 0:
+                    weak.append(other)
+                    RecommendationService._prune_ties -= 1
+            for other in weak:
+                RecommendationService._count_changed(row.pop(other), 0)
+            RecommendationService.pair_count -= len(weak)
+
+            if weak:
+                top = RecommendationService.top_items.get(product_id, [])
+                top[:] = [(neg, other) for neg, other in top if other in row]
+            if not row:
+                del RecommendationService.co_counts[product_id]
+                RecommendationService.top_items.pop(product_id, None)
+
+    @staticmethod
+    def record_order(items: list):
+        """Add one purchased basket to the co-occurrence matrix"""
+        product_ids = RecommendationService._order_products(items)
+        RecommendationService.orders_seen += 1
+
+        for product_id in product_ids:
+            row = RecommendationService.co_counts.setdefault(product_id, {})
+            for other in product_ids:
+                if other == product_id:
+                    continue
+                if other not in row:
+                    RecommendationService.pair_count += 1
+                count = row.get(other, 0) + 1
+                row[other] = count
+                RecommendationService._count_changed(count - 1, count)
+                RecommendationService._update_top(product_id, other, count)
+            if len(row) > config.RECOMMENDATION_MAX_NEIGHBORS:
+                RecommendationService._trim_row(product_id)
+
+        if RecommendationService.pair_count > config.RECOMMENDATION_MAX_PAIRS or RecommendationService._prune_pending:
+            RecommendationService._prune_step(config.RECOMMENDATION_PRUNE_BATCH)
+
+    @staticmethod
+    def handle_payment_event(event: str, payload: dict):
+        """PaymentService listener: count each basket once, when its order is first paid"""
+        if (
+            event == "payment.processed"
+            and payload["transaction"]["status"] == "success"
+            and payload.get("previous_payment_status") != "completed"
+        ):
+            RecommendationService.record_order(payload["order"]["items"])
+
+    @staticmethod
+    def get_recommendations(product_id: str, k: int = 5) -> list:
+        """Products most often bought together with the given product"""
+        top = RecommendationService.top_items.get(product_id, [])
+        return [
+            {
+                "product_id": other,
+                "product_name": RecommendationService.product_names.get(other),
+                "count": -neg_count
+            }
+            for neg_count, other in top[:k]
+        ]
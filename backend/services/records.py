@@ -0,0 +1,179 @@
+import sys
+import time
+import weakref
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+def now_epoch() -> int:
+    """Current time as integer epoch seconds"""
+    return int(time.time())
+
+
+def epoch_to_iso(timestamp: int) -> str:
+    """Render a stored timestamp in the API's ISO format"""
+    return datetime.fromtimestamp(timestamp).isoformat()
+
+
+def parse_price(price: str) -> Optional[float]:
+    """Numeric value of a display price like '₹1,299'"""
+    try:
+        return float(str(price).replace("₹", "").replace(",", "").strip())
+    except ValueError:
+        return None
+
+
+class ProductRef:
+    """One shared copy of a product's display fields.
+
+    Cart lines and order items point at these instead of each holding their
+    own name/price/image strings.
+    """
+
+    __slots__ = ("product_id", "name", "price", "image_url", "unit_price", "__weakref__")
+
+    def __init__(self, product_id: str, name: str, price: str, image_url: str):
+        self.product_id = product_id
+        self.name = name
+        self.price = price
+        self.image_url = image_url
+        self.unit_price = parse_price(price)
+
+
+# Weak, so a ref goes away with the last cart line or order item using it;
+# the fields come from clients and would otherwise accumulate forever
+_product_refs: "weakref.WeakValueDictionary[Tuple[str, str, str, str], ProductRef]" = weakref.WeakValueDictionary()
+
+
+def intern_product(product_id: str, name: str, price: str, image_url: str) -> ProductRef:
+    """Return the shared ProductRef for these fields, creating it once"""
+    key = (product_id, name, price, image_url)
+    ref = _product_refs.get(key)
+    if ref is None:
+        ref = _product_refs[key] = ProductRef(
+            sys.intern(str(product_id)), str(name), sys.intern(str(price)), str(image_url)
+        )
+    return ref
+
+
+class CartLine:
+    __slots__ = ("product", "quantity")
+
+    def __init__(self, product: ProductRef, quantity: int):
+        self.product = product
+        self.quantity = quantity
+
+    def to_dict(self) -> dict:
+        return {
+            "product_id": self.product.product_id,
+            "product_name": self.product.name,
+            "price": self.product.price,
+            "quantity": self.quantity,
+            "image_url": self.product.image_url
+        }
+
+
+class CartRecord:
+    __slots__ = ("user_id", "lines", "total_price", "created_at", "updated_at")
+
+    def __init__(self, user_id: str, created_at: int):
+        self.user_id = user_id
+        self.lines = []
+        self.total_price = 0.0
+        self.created_at = created_at
+        self.updated_at = created_at
+
+    def to_dict(self) -> dict:
+        return {
+            "user_id": self.user_id,
+            "items": [line.to_dict() for line in self.lines],
+            "total_price": self.total_price,
+            "created_at": epoch_to_iso(self.created_at),
+            "updated_at": epoch_to_iso(self.updated_at)
+        }
+
+
+CART_LINE_FIELDS = {
+    "product_id": str, "product_name": str, "price": str, "quantity": int, "image_url": str
+}
+
+
+def _is_cart_line(item) -> bool:
+    """Whether CartLine.to_dict() would give this item back unchanged"""
+    return (
+        isinstance(item, dict)
+        and item.keys() == CART_LINE_FIELDS.keys()
+        and all(type(item[key]) is kind for key, kind in CART_LINE_FIELDS.items())
+    )
+
+
+def compact_items(items: list) -> list:
+    """Order items as CartLines where they have exactly the cart line shape, else as given"""
+    compacted = []
+    for item in items:
+        if _is_cart_line(item):
+            product = intern_product(item["product_id"], item["product_name"], item["price"], item["image_url"])
+            compacted.append(CartLine(product, item["quantity"]))
+        else:
+            compacted.append(item)
+    return compacted
+
+
+class OrderRecord:
+    __slots__ = (
+        "id", "user_id", "user_email", "items", "total_price", "payment_status",
+        "order_status", "delivery_address", "created_at", "updated_at", "reservation_id"
+    )
+
+    def __init__(self, order_id: str, user_id: str, user_email: str, items: list,
+                 total_price: float, delivery_address: str, created_at: int):
+        self.id = order_id
+        self.user_id = sys.intern(user_id)
+        self.user_email = sys.intern(user_email)
+        self.items = compact_items(items)
+        self.total_price = total_price
+        self.payment_status = "pending"
+        self.order_status = "pending"
+        self.delivery_address = delivery_address
+        self.created_at = created_at
+        self.updated_at = created_at
+        self.reservation_id = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "user_email": self.user_email,
+            "items": [item.to_dict() if isinstance(item, CartLine) else item for item in self.items],
+            "total_price": self.total_price,
+            "payment_status": self.payment_status,
+            "order_status": self.order_status,
+            "delivery_address": self.delivery_address,
+            "created_at": epoch_to_iso(self.created_at),
+            "updated_at": epoch_to_iso(self.updated_at)
+        }
+
+
+class TransactionRecord:
+    __slots__ = ("id", "order_id", "amount", "payment_method", "user_id", "status", "timestamp")
+
+    def __init__(self, transaction_id: str, order_id: str, amount: float, payment_method: str,
+                 user_id: str, status: str, timestamp: int):
+        self.id = transaction_id
+        self.order_id = order_id
+        self.amount = amount
+        self.payment_method = sys.intern(payment_method)
+        self.user_id = sys.intern(user_id)
+        self.status = status
+        self.timestamp = timestamp
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "order_id": self.order_id,
+            "amount": self.amount,
+            "payment_method": self.payment_method,
+            "user_id": self.user_id,
+            "status": self.status,
+            "timestamp": epoch_to_iso(self.timestamp)
+        }
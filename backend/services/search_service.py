@@ -14,8 +14,9 @@ class SearchService:
         for product in products:
             name_match = query_lower in product.get("name", "").lower()
             desc_match = query_lower in product.get("description", "").lower() if product.get("description") else False
+            category_match = query_lower == (product.get("category") or "").lower()
             
-            if name_match or desc_match:
+            if name_match or desc_match or category_match:
                 results.append(product)
         
         return results
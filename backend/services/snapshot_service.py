@@ -0,0 +1,358 @@
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import config
+from services.product_detail_service import ProductDetailService
+
+MAGIC = b"FKSNAP01"
+# magic, byte order (0 little / 1 big), product count, token count
+HEADER = struct.Struct("<8sBxxxII")
+# offset, length, array typecode (0 for raw bytes)
+SECTION = struct.Struct("<QQB7x")
+
+# String columns in the order they are written; "url" is the product page
+# used for detail scraping and is not part of the API's product shape
+FIELDS = ("id", "name", "price", "image_url", "rating", "reviews", "description", "category", "url")
+SECTIONS = (
+    [f"{field}:{part}" for field in FIELDS for part in ("offsets", "data")]
+    + ["id_order", "token_offsets", "token_data", "posting_offsets", "postings"]
+)
+
+_token_pattern = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric words of a query or product field"""
+    return _token_pattern.findall(text.lower()) if text else []
+
+
+def _offset_array(total: int) -> array:
+    return array("I") if total < 2 ** 32 else array("Q")
+
+
+class CatalogSnapshot:
+    """Read-only product catalog and token index over a memory-mapped file.
+
+    Every column is a pair of sections: an offsets array and a UTF-8 blob,
+    so product i's field is data[offsets[i]:offsets[i + 1]]. The index is a
+    sorted token table with one posting list of product numbers per token.
+    Opening only parses the header; pages are faulted in as they are read,
+    so load time and memory don't grow with the catalog.
+    """
+
+    def __init__(self, path: str):
+        """Map a snapshot file; raises ValueError if it is empty, truncated or not a snapshot"""
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        try:
+            self._open()
+        except (ValueError, TypeError, struct.error) as e:
+            self.close()
+            raise ValueError(f"{path} is not a valid catalog snapshot: {e}") from e
+
+    def _open(self):
+        self.size = len(self._mm)
+        # Export time, which is as old as any product in the file can be
+        self.created_at = os.path.getmtime(self.path)
+        # Lookups jump around the file; without this each page fault reads
+        # ahead and pulls in neighbouring pages that are never used
+        if hasattr(self._mm, "madvise") and hasattr(mmap, "MADV_RANDOM"):
+            self._mm.madvise(mmap.MADV_RANDOM)
+
+        magic, byteorder, self.count, self.token_count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError("bad magic")
+        if byteorder != (sys.byteorder == "big"):
+            raise ValueError("written on a machine with a different byte order")
+
+        view = memoryview(self._mm)
+        self._views.append(view)
+        self._sections = {}
+        position = HEADER.size
+        for name in SECTIONS:
+            offset, length, typecode = SECTION.unpack_from(self._mm, position)
+            position += SECTION.size
+            if offset + length > self.size:
+                raise ValueError(f"section {name} runs past the end of the file")
+            section = view[offset:offset + length]
+            self._sections[name] = section.cast(chr(typecode)) if typecode else section
+            self._views.append(self._sections[name])
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._mm.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _raw(self, field: str, index: int) -> memoryview:
+        offsets = self._sections[f"{field}:offsets"]
+        return self._sections[f"{field}:data"][offsets[index]:offsets[index + 1]]
+
+    def _field(self, field: str, index: int) -> str:
+        return str(self._raw(field, index), "utf-8")
+
+    def product(self, index: int) -> dict:
+        """Product number `index` in the API's product shape"""
+        return {
+            "id": self._field("id", index),
+            "name": self._field("name", index),
+            "price": self._field("price", index),
+            "image_url": self._field("image_url", index),
+            "rating": self._field("rating", index),
+            "reviews": self._field("reviews", index),
+            "description": self._field("description", index) or None,
+            "category": self._field("category", index) or None
+        }
+
+    def product_url(self, index: int) -> str:
+        return self._field("url", index)
+
+    def iter_products(self) -> Iterator[dict]:
+        for index in range(self.count):
+            product = self.product(index)
+            product["url"] = self.product_url(index)
+            yield product
+
+    def find(self, product_id: str) -> Optional[int]:
+        """Product number for an id, by binary search over the id-sorted order"""
+        target = product_id.encode()
+        order = self._sections["id_order"]
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bytes(self._raw("id", order[mid])) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(order) and bytes(self._raw("id", order[lo])) == target:
+            return order[lo]
+        return None
+
+    def _postings(self, token: str) -> Optional[memoryview]:
+        target = token.encode()
+        offsets = self._sections["token_offsets"]
+        data = self._sections["token_data"]
+        lo, hi = 0, self.token_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bytes(data[offsets[mid]:offsets[mid + 1]]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.token_count or data[offsets[lo]:offsets[lo + 1]] != target:
+            return None
+        posting_offsets = self._sections["posting_offsets"]
+        return self._sections["postings"][posting_offsets[lo]:posting_offsets[lo + 1]]
+
+    def search(self, query: str, limit: int) -> List[int]:
+        """Numbers of products containing every query word, in catalog order"""
+        postings = []
+        for token in set(tokenize(query)):
+            found = self._postings(token)
+            if found is None:
+                return []
+            postings.append(found)
+        if not postings:
+            return []
+
+        # Walk the shortest list and binary search the rest, stopping at the limit
+        postings.sort(key=len)
+        shortest, others = postings[0], postings[1:]
+        results = []
+        for index in shortest:
+            if all(self._contains(other, index) for other in others):
+                results.append(index)
+                if len(results) >= limit:
+                    break
+        return results
+
+    @staticmethod
+    def _contains(posting: memoryview, index: int) -> bool:
+        position = bisect_left(posting, index)
+        return position < len(posting) and posting[position] == index
+
+
+def write_snapshot(path: str, products: Iterable[dict], product_urls: Dict[str, str] = None) -> int:
+    """Write products (first occurrence of each id wins) to a snapshot file; returns the count"""
+    product_urls = product_urls or {}
+    columns = {field: bytearray() for field in FIELDS}
+    ends = {field: [0] for field in FIELDS}
+    index: Dict[str, array] = {}
+    ids = []
+    seen = set()
+
+    for product in products:
+        product_id = str(product.get("id", ""))
+        if not product_id or product_id in seen:
+            continue
+        seen.add(product_id)
+        number = len(ids)
+        ids.append(product_id.encode())
+
+        values = dict(product, id=product_id)
+        values.setdefault("url", product_urls.get(product_id, ""))
+        for field in FIELDS:
+            value = values.get(field)
+            columns[field] += str(value if value is not None else "").encode()
+            ends[field].append(len(columns[field]))
+
+        tokens = set(tokenize(values.get("name")))
+        tokens.update(tokenize(values.get("description")))
+        tokens.update(tokenize(values.get("category")))
+        for token in tokens:
+            posting = index.get(token)
+            if posting is None:
+                posting = index[token] = array("I")
+            posting.append(number)
+
+    sections = {}
+    for field in FIELDS:
+        offsets = _offset_array(len(columns[field]))
+        offsets.extend(ends[field])
+        sections[f"{field}:offsets"] = offsets
+        sections[f"{field}:data"] = columns[field]
+
+    sections["id_order"] = array("I", sorted(range(len(ids)), key=ids.__getitem__))
+
+    tokens = sorted(index)
+    token_data = bytearray()
+    token_ends = [0]
+    posting_ends = [0]
+    for token in tokens:
+        token_data += token.encode()
+        token_ends.append(len(token_data))
+        posting_ends.append(posting_ends[-1] + len(index[token]))
+    sections["token_offsets"] = _offset_array(len(token_data))
+    sections["token_offsets"].extend(token_ends)
+    sections["token_data"] = token_data
+    sections["posting_offsets"] = _offset_array(posting_ends[-1])
+    sections["posting_offsets"].extend(posting_ends)
+    postings = array("I")
+    for token in tokens:
+        postings.extend(index.pop(token))
+    sections["postings"] = postings
+
+    # Lay sections out after the header and section table, 8-byte aligned
+    # so they can be cast in place
+    position = HEADER.size + SECTION.size * len(SECTIONS)
+    table = []
+    for name in SECTIONS:
+        section = sections[name]
+        position = (position + 7) & ~7
+        length = len(section) * section.itemsize if isinstance(section, array) else len(section)
+        typecode = ord(section.typecode) if isinstance(section, array) else 0
+        table.append((position, length, typecode))
+        position += length
+
+    # A temp file of its own, in the same directory so the swap stays on
+    # one filesystem, so concurrent writers never share or remove each other's
+    directory, basename = os.path.split(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f"{basename}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, sys.byteorder == "big", len(ids), len(tokens)))
+            for entry in table:
+                f.write(SECTION.pack(*entry))
+            for name, (offset, _, _) in zip(SECTIONS, table):
+                f.write(b"\0" * (offset - f.tell()))
+                section = sections[name]
+                if isinstance(section, array):
+                    section.tofile(f)
+                else:
+                    f.write(section)
+        # mkstemp creates the file private to its owner
+        os.chmod(temp_path, 0o644)
+        # Atomic swap: a process that has the old file mapped keeps reading it
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return len(ids)
+
+
+class SnapshotService:
+    snapshot: Optional[CatalogSnapshot] = None
+    _lock = threading.Lock()
+    # Exports merge with the loaded snapshot, so they run one at a time
+    _export_lock = threading.Lock()
+
+    @staticmethod
+    def load(path: str = None) -> bool:
+        """Map a snapshot file, replacing the current one; False if there is none"""
+        path = path or config.SNAPSHOT_PATH
+        if not path or not os.path.exists(path):
+            return False
+        snapshot = CatalogSnapshot(path)
+        with SnapshotService._lock:
+            # The previous mapping is left to the garbage collector since
+            # requests may still be reading from it
+            SnapshotService.snapshot = snapshot
+        return True
+
+    @staticmethod
+    def export(products: Iterable[dict], product_urls: Dict[str, str] = None, path: str = None) -> dict:
+        """Write a snapshot of the given products, merged with the loaded one, and map it"""
+        path = path or config.SNAPSHOT_PATH
+        with SnapshotService._export_lock:
+            current = SnapshotService.snapshot
+
+            def merged():
+                yield from products
+                if current is not None:
+                    yield from current.iter_products()
+
+            count = write_snapshot(path, merged(), product_urls)
+            SnapshotService.load(path)
+            return {"path": path, "products": count, "bytes": os.path.getsize(path)}
+
+    @staticmethod
+    def _materialize(snapshot: CatalogSnapshot, index: int) -> dict:
+        """A product dict, registering its page so details can still be fetched"""
+        product = snapshot.product(index)
+        ProductDetailService.register_product_url(product["id"], snapshot.product_url(index))
+        return product
+
+    @staticmethod
+    def search(query: str, limit: int) -> List[dict]:
+        """Snapshot products matching every word of the query"""
+        snapshot = SnapshotService.snapshot
+        if snapshot is None:
+            return []
+        return [SnapshotService._materialize(snapshot, index) for index in snapshot.search(query, limit)]
+
+    @staticmethod
+    def find_product(product_id: str) -> Optional[dict]:
+        """A product from the snapshot by id, or None"""
+        snapshot = SnapshotService.snapshot
+        index = snapshot.find(product_id) if snapshot is not None else None
+        if index is None:
+            return None
+        return SnapshotService._materialize(snapshot, index)
+
+    @staticmethod
+    def status() -> dict:
+        snapshot = SnapshotService.snapshot
+        if snapshot is None:
+            return {"loaded": False, "path": config.SNAPSHOT_PATH}
+        return {
+            "loaded": True,
+            "path": snapshot.path,
+            "products": snapshot.count,
+            "tokens": snapshot.token_count,
+            "bytes": snapshot.size
+        }
@@ -18,13 +18,46 @@ function App() {
   const [sortBy, setSortBy] = useState('relevant');
   const [priceFilter, setPriceFilter] = useState(100000);
 
-  // Fetch categories
+  // Load categories, trending and the default search in one round trip
   useEffect(() => {
-    fetchCategories();
-    fetchTrendingProducts();
-    fetchProducts(searchQuery);
+    fetchBootstrap();
   }, []);
 
+  const fetchBootstrap = async () => {
+    setLoading(true);
+    try {
+      const response = await axios.get(`${API_URL}/bootstrap`, {
+        params: { q: searchQuery, limit: 24 }
+      });
+      const { categories, trending, search } = response.data.sections;
+
+      // Sections that were not ready in time are fetched individually
+      if (categories.status === 'ok') {
+        setCategories(categories.data.categories);
+      } else {
+        fetchCategories();
+      }
+
+      if (trending.status === 'ok') {
+        setTrendingProducts(trending.data.trending);
+      } else {
+        fetchTrendingProducts();
+      }
+
+      if (search.status === 'ok') {
+        setProducts(applySorting(applyFilters(search.data.products)));
+        setLoading(false);
+      } else {
+        fetchProducts(searchQuery);
+      }
+    } catch (error) {
+      console.error('Error fetching bootstrap data:', error);
+      fetchCategories();
+      fetchTrendingProducts();
+      fetchProducts(searchQuery);
+    }
+  };
+
   const fetchCategories = async () => {
     try {
       const response = await axios.get(`${API_URL}/categories`);